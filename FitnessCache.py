@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+
+def genome_key(genome):
+    # List genomes of small integers, such as node colours, hash fastest as bytes.
+    try:
+        return bytes(genome)
+    except (TypeError, ValueError):
+        return tuple(genome)
+
+
+class FitnessCache:
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, genome, fitness_function):
+        key = genome_key(genome)
+        fitness = self.entries.get(key)
+        if fitness is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return fitness
+        self.misses += 1
+        fitness = fitness_function(genome)
+        self.entries[key] = fitness
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return fitness
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return f'{self.hits} hits / {self.misses} misses ({self.hits / lookups:.0%} hit rate)' if lookups else 'no lookups'
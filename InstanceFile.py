@@ -0,0 +1,132 @@
+import mmap
+import struct
+import sys
+from array import array
+
+# Binary instance and solution files shared by the Knapsack, TSP and vertex coloring apps.
+#
+# Instance: header, then int64 item values (Knapsack), or float64 x/y pairs (TSP), or float64 x/y
+# pairs followed by int32 edge endpoint pairs (coloring).
+# Solution: header, then int64 entries (selected items, tour order or node colors).
+# All numbers are little-endian and every array starts on an 8-byte boundary.
+
+KNAPSACK = 1
+TSP = 2
+COLORING = 3
+KINDS = (KNAPSACK, TSP, COLORING)
+
+INSTANCE_MAGIC = b'NPCI'
+SOLUTION_MAGIC = b'NPCS'
+VERSION = 1
+
+# magic, version, kind, item/node count, edge count, target
+instance_header = struct.Struct('<4sHHQQq')
+# magic, version, kind, entry count, objective
+solution_header = struct.Struct('<4sHHQd')
+
+
+class Instance:
+    def __init__(self, kind, values=(), coordinates=(), edges=(), target=0, source=None):
+        self.kind = kind
+        self.values = values
+        self.coordinates = coordinates
+        self.edges = edges
+        self.target = target
+        # Loaded arrays are views into this memory map, which stays open as long as the instance does.
+        self.source = source
+
+    @property
+    def points(self):
+        return list(zip(self.coordinates[0::2], self.coordinates[1::2]))
+
+    @property
+    def edge_pairs(self):
+        return list(zip(self.edges[0::2], self.edges[1::2]))
+
+
+def write_array(file, typecode, data):
+    data = array(typecode, data)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    data.tofile(file)
+    # Pad to the next 8-byte boundary so the following array can be cast in place.
+    file.write(bytes(-len(data) * data.itemsize % 8))
+
+
+def read_array(buffer, offset, typecode, count):
+    size = array(typecode).itemsize * count
+    if offset + size > len(buffer):
+        raise ValueError('instance file is truncated')
+    if sys.byteorder == 'little':
+        view = buffer[offset:offset + size].cast(typecode)
+    else:
+        # array(typecode, bytes) would take every byte as an element; frombytes() reads the raw items.
+        view = array(typecode)
+        view.frombytes(buffer[offset:offset + size])
+        view.byteswap()
+    return view, offset + size + (-size % 8)
+
+
+def map_file(path):
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, memoryview(mapped)
+
+
+def save_instance(path, kind, values=(), coordinates=(), edges=(), target=0):
+    values = array('q', values)
+    coordinates = array('d', coordinates)
+    edges = array('i', edges)
+    if kind == KNAPSACK:
+        count = len(values)
+    else:
+        count = len(coordinates) // 2
+    with open(path, 'wb') as file:
+        file.write(instance_header.pack(INSTANCE_MAGIC, VERSION, kind, count, len(edges) // 2, target))
+        if kind == KNAPSACK:
+            write_array(file, 'q', values)
+        else:
+            write_array(file, 'd', coordinates)
+        if kind == COLORING:
+            write_array(file, 'i', edges)
+
+
+def load_instance(path):
+    mapped, buffer = map_file(path)
+    if len(buffer) < instance_header.size:
+        raise ValueError(f'{path} is not an instance file')
+    magic, version, kind, count, edge_count, target = instance_header.unpack_from(buffer)
+    if magic != INSTANCE_MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not an instance file')
+    if kind not in KINDS:
+        raise ValueError(f'{path} has unknown instance kind {kind}')
+    offset = instance_header.size
+    instance = Instance(kind, target=target, source=mapped)
+    if kind == KNAPSACK:
+        instance.values, offset = read_array(buffer, offset, 'q', count)
+    else:
+        instance.coordinates, offset = read_array(buffer, offset, 'd', count * 2)
+    if kind == COLORING:
+        instance.edges, offset = read_array(buffer, offset, 'i', edge_count * 2)
+    return instance
+
+
+def save_solution(path, kind, entries, objective=0.0):
+    entries = array('q', entries)
+    with open(path, 'wb') as file:
+        file.write(solution_header.pack(SOLUTION_MAGIC, VERSION, kind, len(entries), objective))
+        write_array(file, 'q', entries)
+
+
+def load_solution(path):
+    # Returns (kind, entries, objective); entries is a view into the mapped file.
+    mapped, buffer = map_file(path)
+    if len(buffer) < solution_header.size:
+        raise ValueError(f'{path} is not a solution file')
+    magic, version, kind, count, objective = solution_header.unpack_from(buffer)
+    if magic != SOLUTION_MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a solution file')
+    if kind not in KINDS:
+        raise ValueError(f'{path} has unknown solution kind {kind}')
+    entries, _ = read_array(buffer, solution_header.size, 'q', count)
+    return kind, entries, objective
@@ -1,9 +1,21 @@
+import argparse
 import math
+import multiprocessing
+import os
 import random
 import tkinter as tk
 from tkinter import *
+from tkinter import filedialog
 import threading
 import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import accumulate
+from operator import getitem, itemgetter
+
+import InstanceFile
 
 num_items = 100
 frac_target = 0.7
@@ -18,8 +30,23 @@ num_generations = 999
 pop_size = 50
 elitism_count = 2
 mutation_rate = 0.1
+max_prefix_segments = 16
+exact_core_size = 256
+residue_moduli = range(2, 33)  # moduli whose reachable subset-sum residues are checked before the exact DP
+
+island_count = os.cpu_count() or 1
+migration_interval = 20
+migration_count = 2
+
+stagnation_limit = 100
+diversity_threshold = 0.02
+boosted_mutation_rate = 0.5
+boost_generations = 10
+restart_fraction = 0.9
+
+frame_rate = 30
 
-sleep_time = 0.1
+instance_seed = None
 
 predefined_colors = ['#789DBC', '#FFE3E3', '#FEF9F2', '#C9E9D2', '#DA8359', '#FF8A8A', '#BED754', '#D4ADFC','#FB2576','#F79646','#F7D674','#B4E1A1','#81E8D8','#42F4F4','#4D5360','#263238']
 
@@ -27,13 +54,14 @@ def random_predefined_color():
     return random.choice(predefined_colors)
 
 class Item:
-    def __init__(self):
-        self.value = random.randint(min_value, max_value)
+    def __init__(self, value):
+        self.value = value
         self.color = random_predefined_color()
         self.x = 0
         self.y = 0
         self.w = 0
         self.h = 0
+        self.rect_id = None
 
     def place(self, x, y, w, h):
         self.x = x
@@ -43,7 +71,7 @@ class Item:
 
     def draw(self, canvas, active=False):
         canvas.create_text(self.x + self.w + item_padding + stroke_width * 2, self.y + self.h / 2, text=f'{self.value}', fill="white")
-        canvas.create_rectangle(self.x + stroke_width / 2,
+        self.rect_id = canvas.create_rectangle(self.x + stroke_width / 2,
                                 self.y + stroke_width / 2,
                                 self.x + self.w - stroke_width / 2,
                                 self.y + self.h - stroke_width / 2,
@@ -51,6 +79,473 @@ class Item:
                                 outline=self.color,
                                 width=stroke_width)
 
+    def set_active(self, canvas, active):
+        canvas.itemconfig(self.rect_id, fill=self.color if active else '')
+
+# Genomes are packed into Python ints: bit i is set when item i is in the knapsack.
+def random_genome(count, probability, precision=8):
+    # Each bit is set with the given probability (to `precision` binary digits) using only whole-word operations.
+    level = round(probability * (1 << precision))
+    if level >= 1 << precision:
+        return (1 << count) - 1
+    genome = 0
+    for digit in range(precision):
+        if level >> digit & 1:
+            genome |= random.getrandbits(count)
+        else:
+            genome &= random.getrandbits(count)
+    return genome
+
+def genome_bits(genome, count):
+    return [bit == '1' for bit in reversed(format(genome, f'0{count}b')[-count:])] if count else []
+
+def set_bits(genome):
+    while genome:
+        low_bit = genome & -genome
+        yield low_bit.bit_length() - 1
+        genome ^= low_bit
+
+def popcount(genome):
+    return genome.bit_count()
+
+def build_byte_sums(values):
+    # One 256-entry table per 8 items, mapping each byte of a genome to the sum of the values it selects.
+    tables = []
+    for start in range(0, len(values), 8):
+        table = [0]
+        for value in values[start:start + 8]:
+            table += [total + value for total in table]
+        table += [0] * (256 - len(table))
+        tables.append(array('q', table))
+    return tables
+
+def weighted_sum(genome, byte_sums):
+    return sum(map(getitem, byte_sums, genome.to_bytes(len(byte_sums), 'little')))
+
+class KnapsackSolver:
+    def __init__(self, values, target, on_best=None):
+        self.values = list(values)
+        self.target = target
+        self.on_best = on_best
+        self.num_items = len(self.values)
+        self.byte_sums = build_byte_sums(self.values)
+        self.generation = 0
+        self.population = None
+        self.sums = []
+        self.prefixes = []
+        self.best_genome = None
+        self.best_sum = 0
+        self.best_fitness = math.inf
+        self.stopped = False
+        self.mutation_rate = mutation_rate
+        self.stagnant_generations = 0
+        self.boost_remaining = 0
+        self.diversity = 1.0
+        self.restarts = 0
+        self.mutation_boosts = 0
+
+    @property
+    def solved(self):
+        return self.best_fitness == 0
+
+    def evaluate(self, population):
+        # Sums each genome's selected values a byte at a time through the per-byte lookup tables.
+        byte_sums = self.byte_sums
+        return [weighted_sum(genome, byte_sums) for genome in population]
+
+    def prefix_sums(self, genome):
+        # Running totals at every byte boundary; prefix_sum() resolves the bits inside a byte.
+        genome_bytes = genome.to_bytes(len(self.byte_sums), 'little')
+        return [(0, (genome_bytes, list(accumulate(map(getitem, self.byte_sums, genome_bytes), initial=0))), 0)]
+
+    def prefix_sum(self, prefix, point):
+        # A prefix is a list of (start, byte totals, offset) segments; the last segment starting at or
+        # before `point` gives the sum of the genes below `point`.
+        start, (genome_bytes, cumulative), offset = prefix[bisect_right(prefix, point, key=itemgetter(0)) - 1]
+        byte_index = point >> 3
+        if byte_index >= len(genome_bytes):
+            return cumulative[-1] + offset
+        low_bits = genome_bytes[byte_index] & ((1 << (point & 7)) - 1)
+        return cumulative[byte_index] + self.byte_sums[byte_index][low_bits] + offset
+
+    def crossover_prefix(self, first, second, point):
+        # The child keeps the first parent's genes below `point` and the second parent's from `point` on.
+        shift = self.prefix_sum(first, point) - self.prefix_sum(second, point)
+        head = first[:bisect_right(first, point, key=itemgetter(0))]
+        cut = bisect_right(second, point + 1, key=itemgetter(0))
+        start, totals, offset = second[cut - 1]
+        return head + [(point + 1, totals, offset + shift)] + [(s, t, o + shift) for s, t, o in second[cut:]]
+
+    def mutate_prefix(self, prefix, index, delta):
+        cut = bisect_right(prefix, index + 1, key=itemgetter(0))
+        start, totals, offset = prefix[cut - 1]
+        head = prefix[:cut] if start < index + 1 else prefix[:cut - 1]
+        return head + [(index + 1, totals, offset + delta)] + [(s, t, o + delta) for s, t, o in prefix[cut:]]
+
+    def get_population(self, last_pop=None):
+        population = []
+        if last_pop is None:
+            for _ in range(pop_size):
+                population.append(random_genome(self.num_items, frac_target))
+            return population, self.evaluate(population), [None] * len(population)
+        else:
+            last_sums, last_prefixes = self.sums, self.prefixes
+
+            def parent_prefix(index):
+                # Children derive their prefix sums from their parents' segments; long chains are flattened.
+                prefix = last_prefixes[index]
+                if prefix is None or len(prefix) > max_prefix_segments:
+                    prefix = last_prefixes[index] = self.prefix_sums(last_pop[index])
+                return prefix
+
+            population.extend(last_pop[:elitism_count])
+            sums = last_sums[:elitism_count]
+            prefixes = last_prefixes[:elitism_count]
+            while len(population) < pop_size:
+                first, second = random.sample(range(len(last_pop)), 2)
+                crossover_point = random.randint(0, self.num_items - 1)
+                low_mask = (1 << crossover_point) - 1
+                child = (last_pop[first] & low_mask) | (last_pop[second] & ~low_mask)
+                # The child's sum follows from the parents' prefix sums without touching its genes.
+                first_prefix, second_prefix = parent_prefix(first), parent_prefix(second)
+                total = (self.prefix_sum(first_prefix, crossover_point) + last_sums[second]
+                         - self.prefix_sum(second_prefix, crossover_point))
+                prefix = self.crossover_prefix(first_prefix, second_prefix, crossover_point)
+                if random.random() < self.mutation_rate:
+                    mutate_index = random.randint(0, self.num_items - 1)
+                    mutate_bit = 1 << mutate_index
+                    child ^= mutate_bit
+                    delta = self.values[mutate_index] if child & mutate_bit else -self.values[mutate_index]
+                    total += delta
+                    prefix = self.mutate_prefix(prefix, mutate_index, delta)
+                population.append(child)
+                sums.append(total)
+                prefixes.append(prefix)
+            return population, sums, prefixes
+
+    def step(self):
+        population, sums, prefixes = self.get_population(self.population)
+        target = self.target
+        # Keeping the population sorted puts the elites at the front for the next generation.
+        order = sorted(range(len(population)), key=lambda i: abs(sums[i] - target))
+        self.population = [population[i] for i in order]
+        self.sums = [sums[i] for i in order]
+        self.prefixes = [prefixes[i] for i in order]
+        best_genome = self.population[0]
+        best_fitness = abs(self.sums[0] - target)
+        if best_fitness < self.best_fitness:
+            self.best_genome = best_genome
+            self.best_fitness = best_fitness
+            self.best_sum = self.sums[0]
+            self.stagnant_generations = 0
+            if self.on_best is not None:
+                self.on_best(self.generation, best_genome, self.best_sum)
+        else:
+            self.stagnant_generations += 1
+        self.generation += 1
+        if not self.solved:
+            self.check_convergence()
+        return self.best_genome
+
+    def measure_diversity(self):
+        # Mean fraction of genes in which a genome differs from the current best one.
+        best_genome = self.population[0]
+        differing = sum((genome ^ best_genome).bit_count() for genome in self.population)
+        return differing / (len(self.population) * max(self.num_items, 1))
+
+    def check_convergence(self):
+        if self.boost_remaining:
+            self.boost_remaining -= 1
+            if not self.boost_remaining:
+                self.mutation_rate = mutation_rate
+        self.diversity = self.measure_diversity()
+        if self.stagnant_generations >= stagnation_limit:
+            self.restart()
+        elif self.diversity < diversity_threshold and not self.boost_remaining:
+            self.mutation_rate = boosted_mutation_rate
+            self.boost_remaining = boost_generations
+            self.mutation_boosts += 1
+
+    def restart(self):
+        # Keep the elites and replace part of the remaining population with fresh random genomes.
+        keep = max(elitism_count, len(self.population) - int((len(self.population) - elitism_count) * restart_fraction))
+        fresh = [random_genome(self.num_items, frac_target) for _ in range(len(self.population) - keep)]
+        self.population = self.population[:keep] + fresh
+        self.sums = self.sums[:keep] + self.evaluate(fresh)
+        self.prefixes = self.prefixes[:keep] + [None] * len(fresh)
+        self.stagnant_generations = 0
+        self.restarts += 1
+
+    def stop(self):
+        self.stopped = True
+
+    def convergence_state(self):
+        # What check_convergence() carries from one generation to the next, so an island can resume it.
+        return (self.best_fitness, self.stagnant_generations, self.mutation_rate, self.boost_remaining,
+                self.restarts, self.mutation_boosts)
+
+    def restore(self, population, sums, state=None):
+        # Continue from a population evolved elsewhere, e.g. on another island or after a migration.
+        # Without a saved convergence state the boost, stagnation and restart counters start afresh.
+        self.population = population
+        self.sums = sums
+        self.prefixes = [None] * len(sums)
+        self.generation = 0
+        self.best_genome = None
+        self.best_sum = 0
+        self.stopped = False
+        if state is None:
+            state = (math.inf, 0, mutation_rate, 0, 0, 0)
+        (self.best_fitness, self.stagnant_generations, self.mutation_rate, self.boost_remaining,
+         self.restarts, self.mutation_boosts) = state
+
+    def run(self, max_generations=num_generations, time_budget=None):
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        while not self.solved and not self.stopped and self.generation < max_generations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            self.step()
+        return self.best_genome
+
+def pack_genome(indices, count):
+    genome_bytes = bytearray((count + 7) // 8)
+    for i in indices:
+        genome_bytes[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(genome_bytes, 'little')
+
+def subset_sum_reachable(values, indices, target):
+    # One shift-or pass without checkpoints: whether some subset of `indices` sums to `target`.
+    mask = (1 << (target + 1)) - 1
+    reach = 1
+    for i in indices:
+        if reach >> target & 1:
+            return True
+        reach = (reach | (reach << values[i])) & mask
+    return bool(reach >> target & 1)
+
+def residue_reachable(values, modulus, target):
+    # Subset sums modulo `modulus` as a rotating bitset; usually every residue is reachable within a few items.
+    full = (1 << modulus) - 1
+    reach = 1
+    for value in values:
+        shift = value % modulus
+        reach |= ((reach << shift) | (reach >> (modulus - shift))) & full
+        if reach == full:
+            return True
+    return bool(reach >> target % modulus & 1)
+
+def subset_sum_witness(values, indices, target):
+    # Shift-or DP over reachable sums, one big-int bitset per item. Only every `stride`-th bitset is
+    # kept; the segments in between are recomputed while walking back to recover the witness.
+    if target < 0:
+        return None
+    mask = (1 << (target + 1)) - 1
+    stride = max(1, math.isqrt(len(indices)))
+    checkpoints = []
+    reach = 1
+    count = 0
+    while not reach >> target & 1:
+        if count == len(indices):
+            return None
+        if count % stride == 0:
+            checkpoints.append(reach)
+        reach = (reach | (reach << values[indices[count]])) & mask
+        count += 1
+
+    chosen = []
+    remaining = target
+    for segment in reversed(range(len(checkpoints))):
+        start = segment * stride
+        layers = [checkpoints[segment]]
+        for i in indices[start:min(start + stride, count) - 1]:
+            layers.append((layers[-1] | (layers[-1] << values[i])) & mask)
+        for k in reversed(range(start, min(start + stride, count))):
+            if not layers[k - start] >> remaining & 1:
+                chosen.append(indices[k])
+                remaining -= values[indices[k]]
+    return chosen
+
+def solve_subset_sum(values, target, core_size=exact_core_size):
+    # Exact: returns a packed genome summing to `target`, or None when no subset does.
+    total_value = sum(values)
+    if target < 0 or target > total_value:
+        return None
+    if 0 < target < min(values):
+        return None
+    # Every subset sum is a multiple of the values' gcd: other targets are unreachable, and dividing it out
+    # shrinks the DP. Small moduli catch other residue gaps, e.g. multiples of 3 plus a single 1 never reach
+    # 2 mod 3. Unreachable targets that pass these checks still cost a full pass over all items,
+    # O(n * target / word size): about 3.5 minutes for 10,000 items of up to 60,000.
+    divisor = math.gcd(*values)
+    if target % divisor:
+        return None
+    if divisor > 1:
+        return solve_subset_sum([value // divisor for value in values], target // divisor, core_size)
+    if not all(residue_reachable(values, modulus, target) for modulus in residue_moduli):
+        return None
+    if 2 * target > total_value:
+        # The DP is linear in the target, so solve for the smaller complement and flip the result.
+        genome = solve_subset_sum(values, total_value - target, core_size)
+        return None if genome is None else genome ^ ((1 << len(values)) - 1)
+    order = list(range(len(values)))
+    random.shuffle(order)
+    core, rest = order[:core_size], order[core_size:]
+    # Fill most of the target greedily, leaving a residual in the middle of what the core can reach,
+    # so the DP only runs over the core items and a small range of sums.
+    goal = sum(values[i] for i in core) // 2
+    chosen = []
+    total = 0
+    for i in rest:
+        if target - total - values[i] >= goal:
+            chosen.append(i)
+            total += values[i]
+    witness = subset_sum_witness(values, core, target - total)
+    if witness is None:
+        # Settle reachability in one cheap pass before paying for the checkpointed witness search.
+        if not subset_sum_reachable(values, order, target):
+            return None
+        witness = subset_sum_witness(values, order, target)
+        chosen = []
+    return pack_genome(chosen + witness, len(values))
+
+def generate_values(count, seed=None, low=min_value, high=max_value):
+    # Unique item values drawn without replacement; the same seed always gives the same instance.
+    if count > high - low + 1:
+        raise ValueError(f'cannot draw {count} unique values from [{low}, {high}]')
+    return random.Random(seed).sample(range(low, high + 1), count)
+
+# Each pool worker keeps one solver for the instance and evolves whichever island it is handed.
+island_solver = None
+
+def init_island_worker(values, target):
+    global island_solver
+    island_solver = KnapsackSolver(values, target)
+
+def evolve_island(population, sums, state, generations, seed):
+    # Each island keeps its own convergence state, since one worker process may evolve several islands.
+    random.seed(seed)
+    island_solver.restore(population, sums, state)
+    island_solver.run(generations)
+    return island_solver.population, island_solver.sums, island_solver.convergence_state()
+
+class IslandModel:
+    def __init__(self, values, target, on_best=None, islands=island_count, topology='ring'):
+        self.values = list(values)
+        self.target = target
+        self.on_best = on_best
+        self.islands = islands
+        self.topology = topology
+        self.generation = 0
+        self.migrations = 0
+        self.states = [(None, [], None)] * islands
+        self.best_genome = None
+        self.best_sum = 0
+        self.best_fitness = math.inf
+        self.stopped = False
+
+    @property
+    def solved(self):
+        return self.best_fitness == 0
+
+    @property
+    def restarts(self):
+        return sum(state[4] for _, _, state in self.states if state is not None)
+
+    @property
+    def mutation_boosts(self):
+        return sum(state[5] for _, _, state in self.states if state is not None)
+
+    def stop(self):
+        self.stopped = True
+
+    def migrate(self):
+        # The best genomes of every island replace the worst genomes of its neighbour.
+        if self.islands < 2:
+            return
+        for source in range(self.islands):
+            if self.topology == 'ring':
+                destination = (source + 1) % self.islands
+            else:
+                destination = random.choice([i for i in range(self.islands) if i != source])
+            population, sums, _ = self.states[source]
+            target_population, target_sums, _ = self.states[destination]
+            target_population[-migration_count:] = population[:migration_count]
+            target_sums[-migration_count:] = sums[:migration_count]
+        self.migrations += 1
+
+    def run(self, max_generations=num_generations, time_budget=None):
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(self.islands, mp_context=context, initializer=init_island_worker,
+                                 initargs=(self.values, self.target)) as pool:
+            while not self.solved and not self.stopped and self.generation < max_generations:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                generations = min(migration_interval, max_generations - self.generation)
+                futures = [pool.submit(evolve_island, population, sums, state, generations, random.getrandbits(64))
+                           for population, sums, state in self.states]
+                self.states = [(list(population), list(sums), state)
+                               for population, sums, state in (future.result() for future in futures)]
+                self.generation += generations
+                best_population, best_sums, _ = min(self.states, key=lambda state: abs(state[1][0] - self.target))
+                best_fitness = abs(best_sums[0] - self.target)
+                if best_fitness < self.best_fitness:
+                    self.best_genome = best_population[0]
+                    self.best_fitness = best_fitness
+                    self.best_sum = best_sums[0]
+                    if self.on_best is not None:
+                        self.on_best(self.generation, self.best_genome, self.best_sum)
+                self.migrate()
+        return self.best_genome
+
+def random_target(values):
+    return sum(random.sample(values, int(len(values) * frac_target)))
+
+def save_solution(path, genome, values, target):
+    total = sum(values[i] for i in set_bits(genome))
+    InstanceFile.save_solution(path, InstanceFile.KNAPSACK, set_bits(genome), abs(total - target))
+
+def run_headless(count=num_items, max_generations=num_generations, time_budget=None, seed=None, exact=False,
+                 high=max_value, islands=0, instance_path=None, save_instance_path=None, solution_path=None):
+    random.seed(seed)
+    if instance_path is not None:
+        instance = InstanceFile.load_instance(instance_path)
+        if instance.kind != InstanceFile.KNAPSACK:
+            raise ValueError(f'{instance_path} is not a Knapsack instance')
+        values, target = instance.values, instance.target
+    else:
+        values = generate_values(count, seed, high=high)
+        target = random_target(values)
+    if save_instance_path is not None:
+        InstanceFile.save_instance(save_instance_path, InstanceFile.KNAPSACK, values=values, target=target)
+
+    if exact:
+        start_time = time.perf_counter()
+        genome = solve_subset_sum(values, target)
+        elapsed_time = time.perf_counter() - start_time
+        status = 'unreachable' if genome is None else f'reached with {popcount(genome)} items'
+        print(f'Target {target} {status} (exact) in {elapsed_time:.3f} seconds')
+        if genome is not None and solution_path is not None:
+            save_solution(solution_path, genome, values, target)
+        return genome
+
+    def report(generation, genome, total):
+        print(f'Generation {generation}: sum {total} (target {target}, off by {abs(total - target)})')
+
+    if islands:
+        solver = IslandModel(values, target, on_best=report, islands=islands)
+    else:
+        solver = KnapsackSolver(values, target, on_best=report)
+    start_time = time.perf_counter()
+    solver.run(max_generations, time_budget)
+    elapsed_time = time.perf_counter() - start_time
+    status = 'met' if solver.solved else 'not met'
+    print(f'Target {target} {status} after {solver.generation} generations in {elapsed_time:.3f} seconds')
+    print(f'Restarts: {solver.restarts}, mutation boosts: {solver.mutation_boosts}')
+    if solver.best_genome is not None and solution_path is not None:
+        save_solution(solution_path, solver.best_genome, values, target)
+    return solver
+
 class UI(tk.Tk):
     def __init__(self):
         tk.Tk.__init__(self)
@@ -64,10 +559,19 @@ class UI(tk.Tk):
         self.canvas.place(x=0, y=50, width=self.width, height=self.height - 50)
 
         self.items_list = []
+        self.items_placed = False
+        self.drawn_genome = None
+        self.solution_genome = None  # the last genome a solver produced for the current target
+        self.target_ids = None
+        self.sum_ids = None
         self.target = 0
         self.generation = 0
         self.running = False
         self.start_time = 0
+        self.solver = None
+        self.worker = None
+        self.snapshot = None
+        self.drawn_snapshot = None
 
         # Add buttons and labels to the top bar
         top_bar = Frame(self, bg='#333333', relief=RAISED, bd=2)
@@ -92,6 +596,23 @@ class UI(tk.Tk):
         run_button = Button(top_bar, text="Run Solver", command=self.start_thread, **button_style)
         run_button.pack(side=LEFT, padx=10, pady=5)
 
+        self.use_islands = BooleanVar(self, value=False)
+        islands_check = Checkbutton(top_bar, text=f"Islands ({island_count})", variable=self.use_islands,
+                                    bg="#333333", fg="white", selectcolor="#333333", font=("Arial", 12, "bold"))
+        islands_check.pack(side=LEFT, padx=10, pady=5)
+
+        exact_button = Button(top_bar, text="Exact Solver", command=self.solve_exact, **button_style)
+        exact_button.pack(side=LEFT, padx=10, pady=5)
+
+        save_button = Button(top_bar, text="Save Instance", command=self.save_instance, **button_style)
+        save_button.pack(side=LEFT, padx=10, pady=5)
+
+        load_button = Button(top_bar, text="Load Instance", command=self.load_instance, **button_style)
+        load_button.pack(side=LEFT, padx=10, pady=5)
+
+        solution_button = Button(top_bar, text="Save Solution", command=self.save_solution, **button_style)
+        solution_button.pack(side=LEFT, padx=10, pady=5)
+
         clear_button = Button(top_bar, text="Clear", command=self.clear, **button_style)
         clear_button.pack(side=LEFT, padx=10, pady=5)
 
@@ -105,54 +626,112 @@ class UI(tk.Tk):
 
     def generate_and_draw(self):
         self.generate_knapsack()
+        self.clear_canvas()
         self.draw_items()
 
     def set_target(self):
-        target_set = random.sample(self.items_list, int(num_items * frac_target))
-        self.target = sum(item.value for item in target_set)
+        self.target = random_target([item.value for item in self.items_list])
+        self.solution_genome = None
         self.update_info_label()
         self.draw_target()
 
     def start_thread(self):
+        if self.running:
+            return
         self.running = True
         self.start_time = time.time()
-        thread = threading.Thread(target=self.run, args=())
-        thread.start()
+        self.snapshot = None
+        self.drawn_snapshot = None
+        values = [item.value for item in self.items_list]
+        if self.use_islands.get():
+            solver = IslandModel(values, self.target)
+        else:
+            solver = KnapsackSolver(values, self.target)
+        # Snapshots carry the solver that published them, so one that was stopped but has not exited yet
+        # cannot show up in the next run.
+        solver.on_best = partial(self.publish_snapshot, solver)
+        self.solver = solver
+        self.worker = threading.Thread(target=self.run, args=(solver,), daemon=True)
+        self.worker.start()
+        self.render_frame(solver)
+
+    def solve_exact(self):
+        if not self.items_list or not self.target:
+            return
+        start_time = time.time()
+        genome = solve_subset_sum([item.value for item in self.items_list], self.target)
+        elapsed_time = time.time() - start_time
+        if genome is None:
+            print(f'Target {self.target} is unreachable (exact solver, {elapsed_time:.2f} seconds)')
+            return
+        print(f'Target {self.target} met by the exact solver! Time taken: {elapsed_time:.2f} seconds')
+        self.draw_target()
+        self.draw_sum(self.target, self.target)
+        self.draw_genome(genome, self.generation)
+
+    def save_instance(self):
+        if not self.items_list:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npci', filetypes=[('Instance files', '*.npci')])
+        if path:
+            InstanceFile.save_instance(path, InstanceFile.KNAPSACK, values=[item.value for item in self.items_list],
+                                       target=self.target)
+
+    def load_instance(self):
+        path = filedialog.askopenfilename(filetypes=[('Instance files', '*.npci')])
+        if not path:
+            return
+        try:
+            instance = InstanceFile.load_instance(path)
+        except (OSError, ValueError) as error:
+            print(f'Could not load {path}: {error}')
+            return
+        if instance.kind != InstanceFile.KNAPSACK:
+            print(f'{path} is not a Knapsack instance')
+            return
+        self.clear()
+        self.items_list = [Item(value) for value in instance.values]
+        self.items_placed = False
+        self.target = instance.target
+        self.draw_items()
+        if self.target:
+            self.draw_target()
+        self.update_info_label()
+
+    def save_solution(self):
+        # draw_items() shows the empty selection before any solver has run; only a solver's genome is saved.
+        if self.solution_genome is None or not self.target:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npcs', filetypes=[('Solution files', '*.npcs')])
+        if path:
+            save_solution(path, self.solution_genome, [item.value for item in self.items_list], self.target)
 
     def clear(self):
         self.running = False
+        if self.solver is not None:
+            self.solver.stop()
         self.generation = 0
         self.update_info_label()
         self.clear_canvas()
 
-    def get_rand_item(self):
-        i1 = Item()
-        for i2 in self.items_list:
-            if i1.value == i2.value:
-                return None
-        return i1
-
-    def add_item(self):
-        item = self.get_rand_item()
-        while item is None:
-            item = self.get_rand_item()
-        self.items_list.append(item)
-
     def generate_knapsack(self):
-        self.items_list = []
-        for _ in range(num_items):
-            self.add_item()
+        self.items_list = [Item(value) for value in generate_values(num_items, instance_seed)]
+        self.items_placed = False
 
+    def place_items(self):
+        # Layout is deferred until the items are first drawn.
+        self.items_placed = True
         item_max = max(item.value for item in self.items_list)
         w = self.width - screen_padding
         h = self.height - screen_padding - 50
-        num_rows = math.ceil(num_items / 6)
+        count = len(self.items_list)
+        num_rows = math.ceil(count / 6)
         row_w = w / 8 - item_padding
         row_h = (h - 200) / num_rows
 
         for x in range(0, 6):
             for y in range(0, num_rows):
-                if x * num_rows + y >= num_items:
+                if x * num_rows + y >= count:
                     break
                 item = self.items_list[x * num_rows + y]
                 item_w = row_w / 2
@@ -164,18 +743,29 @@ class UI(tk.Tk):
 
     def clear_canvas(self):
         self.canvas.delete("all")
-
-    def draw_items(self):
-        for item in self.items_list:
-            item.draw(self.canvas)
+        # Canvas items are created once and then updated in place until the next clear.
+        self.drawn_genome = None
+        self.solution_genome = None
+        self.target_ids = None
+        self.sum_ids = None
+
+    def draw_items(self, genome=0):
+        if not self.items_placed:
+            self.place_items()
+        for item, active in zip(self.items_list, genome_bits(genome, len(self.items_list))):
+            item.draw(self.canvas, active)
+        self.drawn_genome = genome
 
     def draw_target(self):
         x = (self.width - screen_padding) / 8 * 7
         y = screen_padding
         w = (self.width - screen_padding) / 8 - screen_padding
         h = self.height / 2 - screen_padding
-        self.canvas.create_rectangle(x, y, x + w, y + h, fill='black')
-        self.canvas.create_text(x + w // 2, y + h + screen_padding, text=f'{self.target}', font=('Arial', 18), fill="white")
+        if self.target_ids is None:
+            self.target_ids = (self.canvas.create_rectangle(x, y, x + w, y + h, fill='black'),
+                               self.canvas.create_text(x + w // 2, y + h + screen_padding, text=f'{self.target}', font=('Arial', 18), fill="white"))
+        else:
+            self.canvas.itemconfig(self.target_ids[1], text=f'{self.target}')
 
     def draw_sum(self, item_sum, target):
         x = (self.width - screen_padding) / 8 * 6
@@ -183,71 +773,77 @@ class UI(tk.Tk):
         w = (self.width - screen_padding) / 8 - screen_padding
         h = self.height / 2 - screen_padding
         h *= (item_sum / target)
-        self.canvas.create_rectangle(x, y, x + w, y + h, fill='black')
-        self.canvas.create_text(x + w // 2, y + h + screen_padding,
-                                text=f'{item_sum} ({"+" if item_sum > target else "-"}{abs(item_sum - target)})',
-                                font=('Arial', 18), fill="white")
+        text = f'{item_sum} ({"+" if item_sum > target else "-"}{abs(item_sum - target)})'
+        if self.sum_ids is None:
+            self.sum_ids = (self.canvas.create_rectangle(x, y, x + w, y + h, fill='black'),
+                            self.canvas.create_text(x + w // 2, y + h + screen_padding, text=text, font=('Arial', 18), fill="white"))
+        else:
+            self.canvas.coords(self.sum_ids[0], x, y, x + w, y + h)
+            self.canvas.coords(self.sum_ids[1], x + w // 2, y + h + screen_padding)
+            self.canvas.itemconfig(self.sum_ids[1], text=text)
 
     def draw_genome(self, genome, gen_num):
+        # Only solvers draw genomes through here.
+        self.solution_genome = genome
         self.generation = gen_num
         self.update_info_label()
-        for i in range(num_items):
-            item = self.items_list[i]
-            active = genome[i]
-            item.draw(self.canvas, active)
-
-    def run(self):
-        def gene_sum(genome):
-            total = sum(self.items_list[i].value for i in range(len(genome)) if genome[i])
-            return total
-
-        def fitness(genome):
-            return abs(gene_sum(genome) - self.target)
-
-        def get_population(last_pop=None):
-            population = []
-            if last_pop is None:
-                for _ in range(pop_size):
-                    genome = [random.random() < frac_target for _ in range(num_items)]
-                    population.append(genome)
-                return population
-            else:
-                elites = [last_pop[i] for i in range(elitism_count)]
-                population.extend(elites)
-                while len(population) < pop_size:
-                    parents = random.sample(last_pop, 2)
-                    crossover_point = random.randint(0, num_items - 1)
-                    child = parents[0][:crossover_point] + parents[1][crossover_point:]
-                    if random.random() < mutation_rate:
-                        mutate_index = random.randint(0, num_items - 1)
-                        child[mutate_index] = not child[mutate_index]
-                    population.append(child)
-                return population
-
-        def generation_step(generation=0, pop=None):
-            if not self.running or generation >= num_generations:
-                return
-
-            if pop is None:
-                pop = get_population()
-
-            fitnesses = sorted(pop, key=fitness)
-            best_genome = fitnesses[0]
-            best_fitness = fitness(best_genome)
-
-            self.after(0, self.clear_canvas)
-            self.after(0, self.draw_target)
-            self.after(0, self.draw_sum, gene_sum(best_genome), self.target)
-            self.after(0, self.draw_genome, best_genome, generation)
-
-            if best_fitness == 0:
-                elapsed_time = time.time() - self.start_time
-                print(f'Target {self.target} met at generation {generation}! Time taken: {elapsed_time:.2f} seconds')
-                return
-
-            self.after(int(sleep_time * 1000), generation_step, generation + 1, get_population(pop))
-
-        generation_step()
+        if self.drawn_genome is None:
+            self.draw_items(genome)
+            return
+        # Only the items whose inclusion bit changed since the last frame are touched.
+        for i in set_bits(genome ^ self.drawn_genome):
+            self.items_list[i].set_active(self.canvas, genome & (1 << i))
+        self.drawn_genome = genome
+
+    def run(self, solver):
+        # Runs on the worker thread at full speed; the UI only ever reads self.snapshot.
+        solver.run(num_generations)
+        elapsed_time = time.time() - self.start_time
+        snapshot = self.snapshot
+        if solver.solved and snapshot is not None and snapshot[0] is solver:
+            print(f'Target {solver.target} met at generation {snapshot[1]}! Time taken: {elapsed_time:.2f} seconds')
+
+    def publish_snapshot(self, solver, generation, genome, total):
+        # A single tuple assignment, so the UI never sees a half-updated snapshot.
+        self.snapshot = (solver, generation, genome, total)
+
+    def render_frame(self, solver):
+        # Frames still queued after Clear, or for a solver a newer run has replaced, draw nothing.
+        if not self.running or solver is not self.solver:
+            return
+        # Checked before reading the snapshot, so a worker that publishes its last snapshot and exits
+        # mid-frame still gets that snapshot drawn before the loop stops.
+        alive = self.worker.is_alive()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot[0] is solver and snapshot is not self.drawn_snapshot:
+            self.drawn_snapshot = snapshot
+            self.draw_target()
+            self.draw_sum(snapshot[3], self.target)
+            self.draw_genome(snapshot[2], solver.generation)
+        else:
+            self.generation = solver.generation
+            self.update_info_label()
+        if alive:
+            self.after(int(1000 / frame_rate), self.render_frame, solver)
+        else:
+            self.running = False
 
 if __name__ == '__main__':
-    UI()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Knapsack genetic algorithm solver')
+    parser.add_argument('--headless', action='store_true', help='run the solver without the UI')
+    parser.add_argument('--items', type=int, default=num_items)
+    parser.add_argument('--generations', type=int, default=num_generations)
+    parser.add_argument('--time-budget', type=float, default=None, help='seconds')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-value', type=int, default=max_value, help='largest item value')
+    parser.add_argument('--exact', action='store_true', help='use the exact subset-sum solver instead of the GA')
+    parser.add_argument('--islands', type=int, default=0, help='number of island populations run in parallel')
+    parser.add_argument('--instance', help='load the instance from this file instead of generating one')
+    parser.add_argument('--save-instance', help='write the instance to this file')
+    parser.add_argument('--save-solution', help='write the best solution to this file')
+    args = parser.parse_args()
+    if args.headless:
+        run_headless(args.items, args.generations, args.time_budget, args.seed, args.exact, args.max_value,
+                     args.islands, args.instance, args.save_instance, args.save_solution)
+    else:
+        UI()
\ No newline at end of file
@@ -1,15 +1,72 @@
+import argparse
+import json
 import math
 import random
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 import os
+import heapq
+import mmap
+import multiprocessing
+import tempfile
+import threading
+import time
+from collections import deque
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress, repeat
+from operator import add, lt
+from queue import Empty
+
+import InstanceFile
+import TsplibFile
 
 os.environ['PYTHONWARNINGS'] = 'ignore'
 
 city_count = 25
 node_size = 7  # Slightly larger node size
 connection_thickness = 1
+idle_node_hue = 'gray'  # nodes not yet on the drawn tour
 margin = 50
+distance_typecode = 'd'  # 'f' halves the distance grid's memory at single precision
+dense_grid_limit = 2000  # above this many cities distances are computed on demand instead of stored
+index_bucket_size = 2  # average cities per spatial index cell
+candidate_count = 8  # nearest neighbours examined by local search
+or_opt_length = 3  # longest segment moved by Or-opt
+two_level_threshold = 5000  # tours this long use the two-level list in local search
+initial_heat = 10000
+warm_start_heat = 0.2  # starting heat for constructed tours, as a fraction of their mean edge length
+cooling_factor = 0.99999
+frame_budget = 0.015  # seconds of annealing between redraws
+anneal_check_interval = 256  # iterations between clock checks
+chain_count = os.cpu_count() or 1  # parallel annealing chains in multi-start mode
+chain_report_interval = 0.1  # seconds between a chain's progress reports
+colony_size = 10  # ants per Ant Colony System iteration
+colony_iterations = 200
+pheromone_beta = 2.0  # weight of the 1/distance heuristic against pheromone
+exploitation = 0.9  # probability an ant takes the best candidate instead of sampling
+local_evaporation = 0.1
+global_evaporation = 0.1
+colony_local_search = True  # apply 2-opt/Or-opt to every ant's tour
+bound_patience = 20  # lower-bound iterations without improvement before the step size halves
+gap_threshold = 0.5  # percent gap to the lower bound at which a run stops early
+bound_duty_cycle = 0.25  # share of the time the lower bound's thread spends computing, so solvers keep the GIL
+exact_dp_limit = 16  # largest instance solved by the Held-Karp dynamic program
+exact_auto_limit = 20  # instances up to this size are always solved exactly
+exact_time_limit = 30  # seconds of branch and bound before settling for the best tour found
+exact_size_limit = 3 * exact_auto_limit  # largest instance the exact solver accepts
+benchmark_solvers = ('annealing', 'local_search', 'multistart', 'colony', 'exact')
+benchmark_time_budget = 10  # seconds per solver and instance
+tsplib_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tsplib')
+solver_names = ["Simulated Annealing", "Multi-start SA", "Ant Colony", "Exact"]
+# Initial tours for simulated annealing, by menu label
+construction_methods = {
+    "Random Start": 'random',
+    "Nearest Neighbour": 'nearest_neighbor',
+    "Greedy Edge": 'greedy',
+    "Space-filling Curve": 'space_filling_curve',
+    "Double Tree": 'double_tree',
+}
 
 class Node:
     def __init__(self, x, y, identifier):
@@ -17,52 +74,161 @@ class Node:
         self.y = y
         self.identifier = identifier
 
-    def render(self, canvas, hue='white'):
-        canvas.create_oval(
+    def render(self, canvas, hue=idle_node_hue):
+        self.oval_id = canvas.create_oval(
             self.x - node_size, self.y - node_size,
             self.x + node_size, self.y + node_size,
-            fill=hue, outline=hue
+            fill=hue, outline=hue, tags=('node',)
         )
+        return self.oval_id
 
-class Edge:
-    def __init__(self, origin, destination):
-        self.origin = origin
-        self.destination = destination
-        self.length = math.hypot(origin.x - destination.x, origin.y - destination.y)
-
-    def render(self, canvas, hue='red', dotted=False):
-        options = {'fill': hue, 'width': connection_thickness}
-        if dotted:
-            options['dash'] = (4, 2)
-        canvas.create_line(
-            self.origin.x, self.origin.y,
-            self.destination.x, self.destination.y,
-            **options
-        )
+class SpatialIndex:
+    # Uniform grid of buckets over the bounding box of `points`, holding the indices in `members`
+    # (all points by default). Sized so each cell holds about index_bucket_size of them.
+    def __init__(self, points, members=None, bucket_size=index_bucket_size):
+        self.points = points
+        members = range(len(points)) if members is None else list(members)
+        xs = [points[i][0] for i in members] or [0]
+        ys = [points[i][1] for i in members] or [0]
+        self.low_x, self.low_y = min(xs), min(ys)
+        width, height = max(xs) - self.low_x, max(ys) - self.low_y
+        count = max(len(xs), 1)
+        self.cell = max(math.sqrt(width * height * bucket_size / count), max(width, height) * bucket_size / count, 1e-9)
+        self.columns = int(width / self.cell) + 1
+        self.rows = int(height / self.cell) + 1
+        self.cells = [[] for _ in range(self.columns * self.rows)]
+        self.size = 0
+        for i in members:
+            self.cells[self.cell_index(*points[i])].append(i)
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def cell_of(self, x, y):
+        column = min(max(int((x - self.low_x) / self.cell), 0), self.columns - 1)
+        row = min(max(int((y - self.low_y) / self.cell), 0), self.rows - 1)
+        return column, row
+
+    def cell_index(self, x, y):
+        column, row = self.cell_of(x, y)
+        return row * self.columns + column
+
+    def discard(self, i):
+        bucket = self.cells[self.cell_index(*self.points[i])]
+        if i in bucket:
+            bucket.remove(i)
+            self.size -= 1
+
+    def ring(self, column, row, radius):
+        # Cells at Chebyshev distance `radius` from (column, row), clipped to the grid.
+        if radius == 0:
+            return [row * self.columns + column]
+        cells = []
+        left, right = max(column - radius, 0), min(column + radius, self.columns - 1)
+        for r in (row - radius, row + radius):
+            if 0 <= r < self.rows:
+                cells.extend(range(r * self.columns + left, r * self.columns + right + 1))
+        for c in (column - radius, column + radius):
+            if 0 <= c < self.columns:
+                cells.extend(r * self.columns + c for r in range(max(row - radius + 1, 0), min(row + radius, self.rows)))
+        return cells
+
+    def nearest(self, x, y, count):
+        # The `count` indexed points closest to (x, y), nearest first. Rings of cells are searched outwards
+        # until the count-th best distance is inside the searched block.
+        column, row = self.cell_of(x, y)
+        point, points, cells = (x, y), self.points, self.cells
+        found = []
+        for radius in range(max(self.columns, self.rows)):
+            for cell in self.ring(column, row, radius):
+                found.extend((math.dist(point, points[i]), i) for i in cells[cell])
+            if len(found) >= count:
+                found.sort()
+                del found[count:]
+                reach = min(x - self.low_x - (column - radius) * self.cell,
+                            self.low_x + (column + radius + 1) * self.cell - x,
+                            y - self.low_y - (row - radius) * self.cell,
+                            self.low_y + (row + radius + 1) * self.cell - y)
+                if found[-1][0] <= reach:
+                    break
+        found.sort()
+        return [i for _, i in found[:count]]
+
+    def within(self, x, y, radius):
+        # Indexed points no farther than `radius` from (x, y).
+        low_column, low_row = self.cell_of(x - radius, y - radius)
+        high_column, high_row = self.cell_of(x + radius, y + radius)
+        point, points = (x, y), self.points
+        return [i for row in range(low_row, high_row + 1)
+                for i in self.cells_between(row, low_column, high_column)
+                if math.dist(point, points[i]) <= radius]
+
+    def cells_between(self, row, low_column, high_column):
+        for cell in self.cells[row * self.columns + low_column:row * self.columns + high_column + 1]:
+            yield from cell
+
+class DistanceRow:
+    __slots__ = ('points', 'point', 'distance')
+
+    def __init__(self, points, point, distance=math.dist):
+        self.points = points
+        self.point = point
+        self.distance = distance
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, other):
+        return self.distance(self.point, self.points[other])
+
+class DistanceOracle:
+    # Stands in for the n x n distance grid on large instances: grid[a][b] is computed on demand, so memory
+    # stays linear, and nearest-neighbour queries go through a spatial index. `distance` may be another
+    # metric (e.g. a TSPLIB rounding); the index still ranks neighbour candidates by plain coordinates.
+    def __init__(self, points, distance=math.dist):
+        self.points = points
+        self.distance = distance
+        self.index = SpatialIndex(points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, city):
+        return DistanceRow(self.points, self.points[city], self.distance)
+
+def problem_distance_grid(problem):
+    # TSPLIB problems keep their own rounded metric, computed on demand above dense_grid_limit like a
+    # generated instance.
+    if len(problem.points) > dense_grid_limit:
+        return DistanceOracle(problem.points, problem.distance_function())
+    return problem.distance_grid(distance_typecode)
 
 class RouteOptimizer:
-    def __init__(self, nodes):
+    def __init__(self, nodes, distance_grid=None, initial_tour='random'):
         self.nodes = nodes
-        self.node_count = len(nodes)
-        self.distance_grid = self.build_distance_grid()
-        self.current_route = list(range(self.node_count))
-        random.shuffle(self.current_route)
+        self.distance_grid = distance_grid if distance_grid is not None else self.build_distance_grid()
+        self.node_count = len(self.distance_grid)
+        points = [(node.x, node.y) for node in nodes] if nodes is not None else None
+        self.current_route = construct_tour(initial_tour, self.distance_grid, points)
         self.optimal_route = self.current_route[:]
         self.shortest_distance = self.compute_route_length(self.optimal_route)
-        self.heat = 10000
-        self.cooling_factor = 0.995
+        self.current_length = self.shortest_distance
+        if initial_tour == 'random':
+            self.heat = initial_heat
+        else:
+            # At initial_heat the first few thousand swaps would scramble a constructed tour, so it anneals
+            # from a temperature on the scale of its own edges instead.
+            self.heat = warm_start_heat * self.current_length / max(self.node_count, 1)
+        self.polish_moves = 0
+        self.cooling_factor = cooling_factor
 
     def build_distance_grid(self):
-        grid = [[0] * self.node_count for _ in range(self.node_count)]
-        for i in range(self.node_count):
-            for j in range(i + 1, self.node_count):
-                distance = math.hypot(
-                    self.nodes[i].x - self.nodes[j].x,
-                    self.nodes[i].y - self.nodes[j].y
-                )
-                grid[i][j] = distance
-                grid[j][i] = distance
-        return grid
+        # One contiguous typed array per row, each filled by a single C-level map over all nodes.
+        points = [(node.x, node.y) for node in self.nodes]
+        if len(points) > dense_grid_limit:
+            return DistanceOracle(points)
+        return [array(distance_typecode, map(math.dist, repeat(point), points)) for point in points]
 
     def compute_route_length(self, route):
         total = 0
@@ -71,29 +237,1032 @@ class RouteOptimizer:
             total += self.distance_grid[a][b]
         return total
 
-    def swap_nodes(self, route):
-        new_route = route[:]
-        i, j = random.sample(range(self.node_count), 2)
-        new_route[i], new_route[j] = new_route[j], new_route[i]
-        return new_route
+    def swap_delta(self, i, j):
+        # Change in tour length from swapping positions i and j; only the edges around them are read.
+        route, grid, n = self.current_route, self.distance_grid, self.node_count
+        if n < 4:
+            return 0.0
+        if i > j:
+            i, j = j, i
+        a, b = route[i], route[j]
+        before_a, after_a = route[i - 1], route[(i + 1) % n]
+        before_b, after_b = route[j - 1], route[(j + 1) % n]
+        if j - i == 1:
+            return grid[before_a][b] + grid[a][after_b] - grid[before_a][a] - grid[b][after_b]
+        if i == 0 and j == n - 1:
+            return grid[before_b][a] + grid[b][after_a] - grid[before_b][b] - grid[a][after_a]
+        return (grid[before_a][b] + grid[b][after_a] + grid[before_b][a] + grid[a][after_b]
+                - grid[before_a][a] - grid[a][after_a] - grid[before_b][b] - grid[b][after_b])
 
     def optimize(self):
-        candidate_route = self.swap_nodes(self.current_route)
-        current_length = self.compute_route_length(self.current_route)
-        candidate_length = self.compute_route_length(candidate_route)
-        if self.should_accept(current_length, candidate_length, self.heat):
-            self.current_route = candidate_route
-            current_length = candidate_length
-            if current_length < self.shortest_distance:
-                self.shortest_distance = current_length
-                self.optimal_route = self.current_route[:]
+        n = self.node_count
+        if n < 2:
+            return
+        i = random.randrange(n)
+        j = random.randrange(n - 1)
+        if j >= i:
+            j += 1
+        delta = self.swap_delta(i, j)
+        if self.should_accept(self.current_length, self.current_length + delta, self.heat):
+            route = self.current_route
+            route[i], route[j] = route[j], route[i]
+            self.current_length += delta
+            if self.current_length < self.shortest_distance:
+                # Resynchronise on every new best so rounding errors never reach the reported length.
+                self.current_length = self.compute_route_length(route)
+                self.shortest_distance = self.current_length
+                self.optimal_route = route[:]
         self.heat *= self.cooling_factor
 
+    def anneal(self, time_budget):
+        # Runs as many iterations as fit in the time budget (or until the system has cooled) and returns the count.
+        deadline = time.perf_counter() + time_budget
+        optimize = self.optimize
+        iterations = 0
+        while self.heat > 1:
+            for _ in range(anneal_check_interval):
+                optimize()
+            iterations += anneal_check_interval
+            if time.perf_counter() >= deadline:
+                break
+        return iterations
+
+    def polish(self, time_budget=None):
+        # Runs 2-opt/Or-opt local search on the best route found so far and keeps the result if it is shorter.
+        if self.node_count < 4:
+            return self.shortest_distance
+        search = LocalSearch(self.distance_grid, self.optimal_route)
+        route = search.optimize(time_budget)
+        self.polish_moves += search.moves
+        length = self.compute_route_length(route)
+        if length < self.shortest_distance:
+            self.optimal_route = route
+            self.shortest_distance = length
+            self.current_route = route[:]
+            self.current_length = length
+        return self.shortest_distance
+
     def should_accept(self, current, candidate, temp):
         if candidate < current:
             return True
         return random.random() < math.exp((current - candidate) / temp)
 
+# Worker-side state for multi-start annealing: every worker maps the same distance grid file, or
+# builds its own DistanceOracle from the points on large instances.
+chain_grid = None
+chain_results = None
+chain_stop = None
+
+def init_annealing_worker(grid_path, node_count, typecode, results, stop, points=None, distance=math.dist):
+    global chain_grid, chain_results, chain_stop
+    if points is not None:
+        chain_grid = DistanceOracle(points, distance)
+    else:
+        chain_grid = map_distance_grid(grid_path, node_count, typecode)
+    chain_results = results
+    chain_stop = stop
+
+def map_distance_grid(path, node_count, typecode):
+    # Rows are zero-copy views into a read-only mapping, so every process shares one copy of the grid.
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    flat = memoryview(mapped).cast(typecode)
+    return [flat[i * node_count:(i + 1) * node_count] for i in range(node_count)]
+
+def anneal_chain(seed):
+    random.seed(seed)
+    optimizer = RouteOptimizer(None, distance_grid=chain_grid)
+    reported = math.inf
+    iterations = 0
+    while optimizer.heat > 1 and not chain_stop.is_set():
+        iterations += optimizer.anneal(chain_report_interval)
+        if optimizer.shortest_distance < reported:
+            reported = optimizer.shortest_distance
+            chain_results.put((seed, reported, optimizer.optimal_route))
+    # A stopped chain has already reported its best; polishing it would only hold up close().
+    if not chain_stop.is_set():
+        optimizer.polish()
+        chain_results.put((seed, optimizer.shortest_distance, optimizer.optimal_route))
+    return iterations
+
+class MultiStartAnnealer(RouteOptimizer):
+    # Independent annealing chains with different seeds on a process pool; each chain streams its
+    # improvements back through a queue and poll() keeps the global best.
+    def __init__(self, nodes, chains=chain_count, distance_grid=None):
+        super().__init__(nodes, distance_grid)
+        self.chains = chains
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.pool = None
+        self.futures = []
+        self.grid_path = None
+
+    def start(self):
+        points, distance = None, math.dist
+        if isinstance(self.distance_grid, DistanceOracle):
+            points, distance = self.distance_grid.points, self.distance_grid.distance
+        else:
+            descriptor, self.grid_path = tempfile.mkstemp(suffix='.grid')
+            with os.fdopen(descriptor, 'wb') as file:
+                for row in self.distance_grid:
+                    row.tofile(file)
+        self.pool = ProcessPoolExecutor(self.chains, mp_context=self.context, initializer=init_annealing_worker,
+                                        initargs=(self.grid_path, self.node_count, distance_typecode,
+                                                  self.results, self.stop_event, points, distance))
+        self.futures = [self.pool.submit(anneal_chain, random.getrandbits(64)) for _ in range(self.chains)]
+
+    @property
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    @property
+    def iterations(self):
+        # Annealing iterations summed over the chains that have finished.
+        return sum(future.result() for future in self.futures if future.done() and not future.cancelled())
+
+    def poll(self):
+        # Drains the reports received so far and returns True when the global best improved.
+        improved = False
+        while True:
+            try:
+                seed, length, route = self.results.get_nowait()
+            except Empty:
+                return improved
+            if length < self.shortest_distance:
+                self.shortest_distance = length
+                self.optimal_route = route
+                improved = True
+
+    def run(self, time_budget=None):
+        # Headless driver: anneals until every chain has cooled or the time budget runs out.
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.start()
+        try:
+            while not self.done and (deadline is None or time.perf_counter() < deadline):
+                time.sleep(chain_report_interval)
+                self.poll()
+        finally:
+            self.close()
+        # Chains stopped by the deadline skip their own polish.
+        self.polish()
+        return self.optimal_route
+
+    def drain(self, stopping):
+        while not stopping.is_set():
+            self.poll()
+            stopping.wait(0.01)
+
+    def close(self):
+        self.stop_event.set()
+        for future in self.futures:
+            future.cancel()
+        if self.pool is not None:
+            # A worker cannot exit until its reports have been flushed into the queue's pipe, so the queue
+            # has to be drained while the pool shuts down or a full pipe blocks shutdown forever.
+            stopping = threading.Event()
+            drainer = threading.Thread(target=self.drain, args=(stopping,))
+            drainer.start()
+            try:
+                self.pool.shutdown()
+            finally:
+                stopping.set()
+                drainer.join()
+            self.pool = None
+        self.poll()
+        if self.grid_path is not None:
+            os.remove(self.grid_path)
+            self.grid_path = None
+
+def nearest_neighbors(distance_grid, count):
+    # Each node's `count` closest other nodes, nearest first.
+    if isinstance(distance_grid, DistanceOracle):
+        index = distance_grid.index
+        return [[j for j in index.nearest(x, y, count + 1) if j != i][:count]
+                for i, (x, y) in enumerate(distance_grid.points)]
+    n = len(distance_grid)
+    return [[j for j in heapq.nsmallest(count + 1, range(n), key=row.__getitem__) if j != i][:count]
+            for i, row in enumerate(distance_grid)]
+
+class ArrayTour:
+    # A tour stored as a city list plus each city's position in it.
+    def __init__(self, route):
+        self.route = list(route)
+        self.position = [0] * len(self.route)
+        for index, city in enumerate(self.route):
+            self.position[city] = index
+
+    def next(self, city):
+        return self.route[(self.position[city] + 1) % len(self.route)]
+
+    def prev(self, city):
+        return self.route[self.position[city] - 1]
+
+    def between(self, a, b, c):
+        # True when b lies on the path that runs forward from a to c.
+        i, j, k = self.position[a], self.position[b], self.position[c]
+        if i <= k:
+            return i <= j <= k
+        return j >= i or j <= k
+
+    def reverse(self, a, b):
+        # Reverse the path running forward from a to b. The shorter side of the cycle is reversed
+        # instead when that is cheaper, which leaves the same cycle in the opposite orientation.
+        route, position, n = self.route, self.position, len(self.route)
+        i, j = position[a], position[b]
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+        if length < 2:
+            return
+        if i <= j:
+            route[i:j + 1] = route[i:j + 1][::-1]
+            for index in range(i, j + 1):
+                position[route[index]] = index
+            return
+        for _ in range(length // 2):
+            route[i], route[j] = route[j], route[i]
+            position[route[i]] = i
+            position[route[j]] = j
+            i = (i + 1) % n
+            j = (j - 1) % n
+
+    def sequence(self):
+        return self.route[:]
+
+class TwoLevelTour:
+    # Two-level doubly-linked list: the tour is a ring of segments of about sqrt(n) cities, each a city
+    # list with a reversed flag. A reversal splits at most two segments at its ends, then reverses the
+    # order of the whole segments between them and toggles their flags, so it costs O(sqrt(n)) instead
+    # of O(n). Segments are rebuilt once splitting has doubled their number. Same interface as ArrayTour.
+    def __init__(self, route):
+        n = len(route)
+        self.node_count = n
+        self.parent = [0] * n
+        self.index = [0] * n
+        self.rebuild(list(route))
+
+    def rebuild(self, route):
+        size = max(math.isqrt(len(route)), 1)
+        self.items = [route[start:start + size] for start in range(0, len(route), size)]
+        self.flipped = [False] * len(self.items)
+        self.order = list(range(len(self.items)))
+        self.rank = [0] * len(self.items)
+        self.start = [0] * len(self.items)
+        self.segment_limit = 2 * len(self.items) + 2
+        for segment, cities in enumerate(self.items):
+            for index, city in enumerate(cities):
+                self.parent[city] = segment
+                self.index[city] = index
+        self.renumber()
+
+    def renumber(self):
+        position = 0
+        for rank, segment in enumerate(self.order):
+            self.rank[segment] = rank
+            self.start[segment] = position
+            position += len(self.items[segment])
+
+    def offset(self, city):
+        # Position of the city within its segment, in tour order.
+        segment = self.parent[city]
+        if self.flipped[segment]:
+            return len(self.items[segment]) - 1 - self.index[city]
+        return self.index[city]
+
+    def position(self, city):
+        return self.start[self.parent[city]] + self.offset(city)
+
+    def next(self, city):
+        segment = self.parent[city]
+        cities = self.items[segment]
+        if self.flipped[segment]:
+            index = self.index[city] - 1
+            if index >= 0:
+                return cities[index]
+        else:
+            index = self.index[city] + 1
+            if index < len(cities):
+                return cities[index]
+        following = self.order[(self.rank[segment] + 1) % len(self.order)]
+        return self.items[following][-1] if self.flipped[following] else self.items[following][0]
+
+    def prev(self, city):
+        segment = self.parent[city]
+        cities = self.items[segment]
+        if self.flipped[segment]:
+            index = self.index[city] + 1
+            if index < len(cities):
+                return cities[index]
+        else:
+            index = self.index[city] - 1
+            if index >= 0:
+                return cities[index]
+        preceding = self.order[self.rank[segment] - 1]
+        return self.items[preceding][0] if self.flipped[preceding] else self.items[preceding][-1]
+
+    def between(self, a, b, c):
+        # True when b lies on the path that runs forward from a to c.
+        i, j, k = self.position(a), self.position(b), self.position(c)
+        if i <= k:
+            return i <= j <= k
+        return j >= i or j <= k
+
+    def split(self, segment, offset):
+        # Splits the segment so that its city at `offset` (in tour order) starts a new segment.
+        cities = self.items[segment]
+        flipped = self.flipped[segment]
+        cut = len(cities) - offset if flipped else offset
+        moved = cities[cut:]
+        del cities[cut:]
+        created = len(self.items)
+        self.items.append(moved)
+        self.flipped.append(flipped)
+        self.rank.append(0)
+        self.start.append(0)
+        for index, city in enumerate(moved):
+            self.parent[city] = created
+            self.index[city] = index
+        # The stored tail comes after the head in tour order, or before it when the segment is flipped.
+        # Ranks are left stale until the caller renumbers.
+        self.order.insert(self.order.index(segment) + (0 if flipped else 1), created)
+
+    def reverse(self, a, b):
+        # Reverse the path running forward from a to b, or the shorter complementary side instead,
+        # which leaves the same cycle in the opposite orientation.
+        n = self.node_count
+        length = (self.position(b) - self.position(a)) % n + 1
+        if 2 * length > n:
+            a, b = self.next(b), self.prev(a)
+            length = n - length
+        if length < 2:
+            return
+        offset = self.offset(a)
+        if offset:
+            self.split(self.parent[a], offset)
+        offset = self.offset(b) + 1
+        if offset < len(self.items[self.parent[b]]):
+            self.split(self.parent[b], offset)
+        # The path is now a run of whole segments: reverse their order and toggle each one's flag.
+        order, flipped, count = self.order, self.flipped, len(self.order)
+        i, j = order.index(self.parent[a]), order.index(self.parent[b])
+        span = (j - i) % count + 1
+        for step in range(span):
+            segment = order[(i + step) % count]
+            flipped[segment] = not flipped[segment]
+        for _ in range(span // 2):
+            order[i], order[j] = order[j], order[i]
+            i = (i + 1) % count
+            j = (j - 1) % count
+        if len(order) > self.segment_limit:
+            self.rebuild(self.sequence())
+        else:
+            self.renumber()
+
+    def sequence(self):
+        route = []
+        for segment in self.order:
+            cities = self.items[segment]
+            route.extend(reversed(cities) if self.flipped[segment] else cities)
+        return route
+
+class LocalSearch:
+    # 2-opt and Or-opt restricted to each city's nearest neighbours, with don't-look bits: only cities
+    # next to a recently changed edge are examined again.
+    def __init__(self, distance_grid, route, neighbor_count=candidate_count, neighbors=None):
+        self.grid = distance_grid
+        self.tour = TwoLevelTour(route) if len(route) >= two_level_threshold else ArrayTour(route)
+        self.node_count = len(route)
+        self.neighbors = neighbors if neighbors is not None else nearest_neighbors(distance_grid, neighbor_count)
+        self.moves = 0
+
+    @property
+    def route(self):
+        return self.tour.sequence()
+
+    def move(self, t1, t2, t3, t4):
+        # Replace edges (t1, t2) and (t3, t4), where t2 follows t1 and t4 follows t3, with (t1, t3) and (t2, t4).
+        if self.tour.next(t1) == t2:
+            self.tour.reverse(t2, t3)
+        else:
+            self.tour.reverse(t1, t4)
+        self.moves += 1
+
+    def improve_two_opt(self, a):
+        grid, tour = self.grid, self.tour
+        for succ in (tour.next, tour.prev):
+            a_next = succ(a)
+            removed = grid[a][a_next]
+            for c in self.neighbors[a]:
+                added = grid[a][c]
+                if added >= removed:
+                    break
+                c_next = succ(c)
+                if c == a_next or c_next == a:
+                    continue
+                if added + grid[a_next][c_next] - removed - grid[c][c_next] < -1e-9:
+                    if succ == tour.next:
+                        self.move(a, a_next, c, c_next)
+                    else:
+                        self.move(a_next, a, c_next, c)
+                    return a, a_next, c, c_next
+        return None
+
+    def improve_or_opt(self, a):
+        grid, tour = self.grid, self.tour
+        for length in range(1, or_opt_length + 1):
+            if self.node_count < length + 4:
+                return None
+            segment = [a]
+            for _ in range(length - 1):
+                segment.append(tour.next(segment[-1]))
+            e = segment[-1]
+            p, q = tour.prev(a), tour.next(e)
+            removal_gain = grid[p][a] + grid[e][q] - grid[p][q]
+            for end in (a, e):
+                for c in self.neighbors[end]:
+                    if grid[end][c] >= removal_gain:
+                        break
+                    if c in segment:
+                        continue
+                    for x, y in ((c, tour.next(c)), (tour.prev(c), c)):
+                        if x in segment or y in segment:
+                            continue
+                        base = removal_gain - grid[x][y]
+                        forward = grid[x][a] + grid[e][y]
+                        backward = grid[x][e] + grid[a][y]
+                        if min(forward, backward) - base < -1e-9:
+                            self.insert_segment(p, a, e, q, x, y, forward < backward)
+                            return p, a, e, q, x, y
+        return None
+
+    def insert_segment(self, p, a, e, q, x, y, keep_direction):
+        # Moves the path a..e (between p and q) into the edge (x, y) as a sequence of 2-opt moves.
+        self.move(p, a, x, y)
+        self.move(p, x, q, e)
+        if keep_direction:
+            self.move(x, e, a, y)
+
+    def optimize(self, time_budget=None):
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        active = [True] * self.node_count
+        queue = deque(self.tour.sequence())
+        while queue:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            city = queue.popleft()
+            active[city] = False
+            changed = self.improve_two_opt(city) or self.improve_or_opt(city)
+            if changed:
+                for node in changed:
+                    if not active[node]:
+                        active[node] = True
+                        queue.append(node)
+        return self.route
+
+def nearest_neighbor_tour(distance_grid, neighbors=None, start=0):
+    # Prefers the first unvisited entry of the candidate list and only scans every city when none is left.
+    n = len(distance_grid)
+    if neighbors is None:
+        neighbors = nearest_neighbors(distance_grid, min(candidate_count, n - 1))
+    visited = bytearray(n)
+    visited[start] = 1
+    unvisited = set(range(n))
+    unvisited.discard(start)
+    spatial = remaining_index(distance_grid, unvisited)
+    route = [start]
+    while unvisited:
+        city = route[-1]
+        following = next((c for c in neighbors[city] if not visited[c]), None)
+        if following is None:
+            following = closest_remaining(distance_grid, city, unvisited, spatial)
+        visited[following] = 1
+        unvisited.discard(following)
+        if spatial is not None:
+            spatial.discard(following)
+        route.append(following)
+    return route
+
+def remaining_index(distance_grid, cities):
+    # A spatial index over `cities` when distances are computed on demand; None on a dense grid,
+    # where scanning a row is cheaper.
+    if isinstance(distance_grid, DistanceOracle):
+        return SpatialIndex(distance_grid.points, cities)
+    return None
+
+def closest_remaining(distance_grid, city, remaining, spatial):
+    if spatial is None:
+        return min(remaining, key=distance_grid[city].__getitem__)
+    return spatial.nearest(*distance_grid.points[city], 1)[0]
+
+def find_root(parent, city):
+    while parent[city] != city:
+        parent[city] = parent[parent[city]]
+        city = parent[city]
+    return city
+
+def candidate_edges(distance_grid, neighbors):
+    # Every nearest-neighbour edge once, shortest first.
+    edges = {(min(i, j), max(i, j)) for i, row in enumerate(neighbors) for j in row}
+    return sorted(edges, key=lambda edge: distance_grid[edge[0]][edge[1]])
+
+def greedy_edge_tour(distance_grid, neighbors=None):
+    # Adds the shortest candidate edges that keep every degree <= 2 and close no cycle, then chains the
+    # resulting path fragments together nearest-endpoint first.
+    n = len(distance_grid)
+    if n < 3:
+        return list(range(n))
+    if neighbors is None:
+        neighbors = nearest_neighbors(distance_grid, min(candidate_count, n - 1))
+    degree = bytearray(n)
+    parent = list(range(n))
+    links = [[] for _ in range(n)]
+    for i, j in candidate_edges(distance_grid, neighbors):
+        if degree[i] < 2 and degree[j] < 2:
+            root_i, root_j = find_root(parent, i), find_root(parent, j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+                degree[i] += 1
+                degree[j] += 1
+                links[i].append(j)
+                links[j].append(i)
+    endpoints = {city for city in range(n) if degree[city] < 2}
+    spatial = remaining_index(distance_grid, endpoints)
+    route = []
+    visited = bytearray(n)
+    city = min(endpoints)
+    while True:
+        # Walk the fragment that starts at `city` to its other end.
+        previous = None
+        while True:
+            route.append(city)
+            visited[city] = 1
+            endpoints.discard(city)
+            if spatial is not None:
+                spatial.discard(city)
+            following = next((c for c in links[city] if c != previous), None)
+            if following is None or visited[following]:
+                break
+            previous, city = city, following
+        if not endpoints:
+            return route
+        city = closest_remaining(distance_grid, city, endpoints, spatial)
+
+def hilbert_index(x, y, order):
+    index = 0
+    side = 1 << (order - 1)
+    while side:
+        rx = 1 if x & side else 0
+        ry = 1 if y & side else 0
+        index += side * side * ((3 * rx) ^ ry)
+        if not ry:
+            if rx:
+                x = side - 1 - x
+                y = side - 1 - y
+            x, y = y, x
+        side >>= 1
+    return index
+
+def space_filling_curve_tour(points, order=16):
+    # Visits the cities in the order of a Hilbert curve over their bounding box: O(n log n).
+    if not points:
+        return []
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    low_x, low_y = min(xs), min(ys)
+    span = max(max(xs) - low_x, max(ys) - low_y) or 1
+    scale = ((1 << order) - 1) / span
+    keys = [hilbert_index(int((x - low_x) * scale), int((y - low_y) * scale), order) for x, y in points]
+    return sorted(range(len(points)), key=keys.__getitem__)
+
+def double_tree_tour(distance_grid, neighbors=None):
+    # Preorder walk of a minimum spanning tree of the candidate graph (Kruskal); if the candidate graph
+    # is disconnected, the walks of its trees are concatenated.
+    n = len(distance_grid)
+    if n < 3:
+        return list(range(n))
+    if neighbors is None:
+        neighbors = nearest_neighbors(distance_grid, min(candidate_count, n - 1))
+    parent = list(range(n))
+    children = [[] for _ in range(n)]
+    for i, j in candidate_edges(distance_grid, neighbors):
+        root_i, root_j = find_root(parent, i), find_root(parent, j)
+        if root_i != root_j:
+            parent[root_i] = root_j
+            children[i].append(j)
+            children[j].append(i)
+    route = []
+    visited = bytearray(n)
+    for root in range(n):
+        if visited[root]:
+            continue
+        stack = [root]
+        visited[root] = 1
+        while stack:
+            city = stack.pop()
+            route.append(city)
+            for child in sorted(children[city], key=distance_grid[city].__getitem__, reverse=True):
+                if not visited[child]:
+                    visited[child] = 1
+                    stack.append(child)
+    return route
+
+def construct_tour(method, distance_grid, points=None, neighbors=None):
+    n = len(distance_grid)
+    if method == 'nearest_neighbor' and n > 1:
+        return nearest_neighbor_tour(distance_grid, neighbors)
+    if method == 'greedy':
+        return greedy_edge_tour(distance_grid, neighbors)
+    if method == 'space_filling_curve' and points is not None:
+        return space_filling_curve_tour(points)
+    if method == 'double_tree':
+        return double_tree_tour(distance_grid, neighbors)
+    route = list(range(n))
+    random.shuffle(route)
+    return route
+
+class AntColonyOptimizer(RouteOptimizer):
+    # Ant Colony System. Pheromone is kept only on each city's candidate edges (nearest neighbours),
+    # next to the matching 1/distance^beta heuristic, so choosing the next city only weighs k entries.
+    def __init__(self, nodes, ant_count=colony_size, distance_grid=None):
+        super().__init__(nodes, distance_grid)
+        n = self.node_count
+        self.ant_count = ant_count
+        self.iteration = 0
+        self.neighbors = nearest_neighbors(self.distance_grid, min(candidate_count, n - 1)) if n > 1 else [[] for _ in range(n)]
+        self.neighbor_index = [{city: m for m, city in enumerate(row)} for row in self.neighbors]
+        self.heuristic = [array('d', [(1.0 / max(self.distance_grid[i][j], 1e-9)) ** pheromone_beta for j in row])
+                          for i, row in enumerate(self.neighbors)]
+        if n > 1:
+            self.optimal_route = nearest_neighbor_tour(self.distance_grid, self.neighbors)
+            self.shortest_distance = self.compute_route_length(self.optimal_route)
+        self.initial_pheromone = 1.0 / (n * self.shortest_distance) if n > 1 and self.shortest_distance else 1.0
+        self.pheromone = [array('d', [self.initial_pheromone] * len(row)) for row in self.neighbors]
+
+    @property
+    def finished(self):
+        return self.iteration >= colony_iterations
+
+    def deposit(self, a, b, decay, amount):
+        # Symmetric update on whichever of the two candidate lists hold the edge.
+        for i, j in ((a, b), (b, a)):
+            m = self.neighbor_index[i].get(j)
+            if m is not None:
+                self.pheromone[i][m] = (1 - decay) * self.pheromone[i][m] + decay * amount
+
+    def construct(self, start):
+        grid, neighbors, pheromone, heuristic = self.distance_grid, self.neighbors, self.pheromone, self.heuristic
+        visited = bytearray(self.node_count)
+        visited[start] = 1
+        unvisited = set(range(self.node_count))
+        unvisited.discard(start)
+        spatial = remaining_index(grid, unvisited)
+        route = [start]
+        city = start
+        while unvisited:
+            row = neighbors[city]
+            options = [m for m in range(len(row)) if not visited[row[m]]]
+            if options:
+                weights = [pheromone[city][m] * heuristic[city][m] for m in options]
+                if random.random() < exploitation:
+                    choice = options[max(range(len(options)), key=weights.__getitem__)]
+                else:
+                    choice = random.choices(options, weights)[0]
+                following = row[choice]
+            else:
+                # Every candidate is taken: fall back to the nearest unvisited city.
+                following = closest_remaining(grid, city, unvisited, spatial)
+            self.deposit(city, following, local_evaporation, self.initial_pheromone)
+            visited[following] = 1
+            unvisited.discard(following)
+            if spatial is not None:
+                spatial.discard(following)
+            route.append(following)
+            city = following
+        return route
+
+    def step(self):
+        # One colony iteration; returns True when the best tour improved.
+        self.iteration += 1
+        if self.node_count < 4:
+            return False
+        improved = False
+        for _ in range(self.ant_count):
+            route = self.construct(random.randrange(self.node_count))
+            if colony_local_search:
+                route = LocalSearch(self.distance_grid, route, neighbors=self.neighbors).optimize()
+            length = self.compute_route_length(route)
+            if length < self.shortest_distance:
+                self.shortest_distance = length
+                self.optimal_route = route
+                improved = True
+        best = self.optimal_route
+        reward = 1.0 / self.shortest_distance
+        for i in range(self.node_count):
+            self.deposit(best[i - 1], best[i], global_evaporation, reward)
+        self.current_route = self.optimal_route[:]
+        self.current_length = self.shortest_distance
+        return improved
+
+    def run_for(self, time_budget):
+        # Runs colony iterations for up to the time budget (at least one) and returns how many ran.
+        deadline = time.perf_counter() + time_budget
+        iterations = 0
+        while not self.finished:
+            self.step()
+            iterations += 1
+            if time.perf_counter() >= deadline:
+                break
+        return iterations
+
+def one_tree(distance_grid, penalties):
+    # Minimum 1-tree under edge costs d(i, j) + penalties[i] + penalties[j]: a spanning tree of cities
+    # 1..n-1 (Prim, one C-level pass over a grid row per added city) plus city 0's two cheapest edges.
+    # Returns its cost and every city's degree.
+    n = len(distance_grid)
+    inf = math.inf
+    adjusted = list(penalties)
+    adjusted[0] = adjusted[1] = inf  # cities outside the growing tree keep their penalty
+    key = [inf] * n
+    parent = [0] * n
+    degrees = [0] * n
+    length = 0.0
+    city = 1
+    for _ in range(n - 2):
+        weights = list(map(add, map(add, distance_grid[city], adjusted), repeat(penalties[city])))
+        for other in compress(range(n), map(lt, weights, key)):
+            key[other] = weights[other]
+            parent[other] = city
+        city = key.index(min(key))
+        length += key[city]
+        degrees[city] += 1
+        degrees[parent[city]] += 1
+        key[city] = adjusted[city] = inf
+    costs = list(map(add, distance_grid[0], penalties))
+    costs[0] = inf
+    for other in heapq.nsmallest(2, range(1, n), key=costs.__getitem__):
+        length += costs[other] + penalties[0]
+        degrees[other] += 1
+        degrees[0] += 1
+    return length, degrees
+
+class HeldKarpBound:
+    # Held-Karp lower bound: the 1-tree bound raised by subgradient optimisation of the node penalties,
+    # with Polyak steps towards the best known tour length. Needs a dense distance grid.
+    def __init__(self, distance_grid):
+        self.distance_grid = distance_grid
+        n = len(distance_grid)
+        self.penalties = [0.0] * n
+        self.bound = -math.inf
+        self.step_scale = 2.0
+        self.stalled = 0
+        self.iteration = 0
+        self.finished = n < 3 or isinstance(distance_grid, DistanceOracle)
+        self.upper_bound = math.inf
+        self.stopping = threading.Event()
+        if n == 2:
+            self.bound = 2 * distance_grid[0][1]
+
+    def step(self, upper_bound):
+        self.iteration += 1
+        length, degrees = one_tree(self.distance_grid, self.penalties)
+        value = length - 2 * sum(self.penalties)
+        if value > self.bound + 1e-9:
+            self.bound = value
+            self.stalled = 0
+        else:
+            self.stalled += 1
+            if self.stalled >= bound_patience:
+                self.step_scale /= 2
+                self.stalled = 0
+        deviations = [degree - 2 for degree in degrees]
+        norm = sum(deviation * deviation for deviation in deviations)
+        if norm == 0 or value >= upper_bound - 1e-9 or self.step_scale < 1e-3:
+            # A 1-tree that is a tour, or one as long as the best tour, proves that tour optimal.
+            self.finished = True
+            return
+        step = self.step_scale * (upper_bound - value) / norm
+        self.penalties = [penalty + step * deviation for penalty, deviation in zip(self.penalties, deviations)]
+
+    def run_for(self, time_budget, upper_bound):
+        deadline = time.perf_counter() + time_budget
+        while not self.finished and time.perf_counter() < deadline:
+            self.step(upper_bound)
+
+    def start(self, upper_bound):
+        # Raises the bound on a daemon thread: one O(n^2) step can take longer than a whole frame, so the
+        # GUI only updates upper_bound and reads `bound`.
+        self.upper_bound = upper_bound
+        threading.Thread(target=self.run_until_stopped, daemon=True).start()
+
+    def run_until_stopped(self):
+        # Rests after every step so that it computes for only bound_duty_cycle of the time.
+        rest = (1 - bound_duty_cycle) / bound_duty_cycle
+        while not self.finished and not self.stopping.is_set():
+            started = time.perf_counter()
+            self.step(self.upper_bound)
+            self.stopping.wait((time.perf_counter() - started) * rest)
+
+    def stop(self):
+        self.stopping.set()
+
+    def gap(self, length):
+        # Percentage by which `length` exceeds the bound, or None before there is a positive bound.
+        if self.bound <= 0:
+            return None
+        return max(100 * (length - self.bound) / self.bound, 0.0)
+
+class HeldKarpProgram:
+    # Exact Held-Karp dynamic program over subsets of cities 1..n-1 (city i + 1 is bit i). cost[mask][j] is
+    # the shortest path from city 0 through `mask` ending at j; each entry is one C-level min over a row.
+    # O(2^n n^2) time and O(2^n n) memory, so only for n up to about exact_dp_limit. Masks are filled in
+    # increasing order, which every subset needs of its predecessors, so run_for() can stop between any two.
+    def __init__(self, distance_grid):
+        self.distance_grid = distance_grid
+        n = len(distance_grid)
+        self.m = m = max(n - 1, 0)
+        self.rows = [array('d', distance_grid[j + 1][1:]) for j in range(m)]
+        self.cost = [None] * (1 << m)
+        for j in range(m):
+            start = array('d', repeat(math.inf, m))
+            start[j] = distance_grid[0][j + 1]
+            self.cost[1 << j] = start
+        self.next_mask = 3
+        self.subsets = 0
+
+    @property
+    def finished(self):
+        return self.next_mask >= 1 << self.m
+
+    def run_for(self, time_budget):
+        deadline = time.perf_counter() + time_budget
+        cost, rows, m = self.cost, self.rows, self.m
+        inf = math.inf
+        mask, end = self.next_mask, 1 << m
+        while mask < end:
+            if not mask % 64 and time.perf_counter() >= deadline:
+                break
+            if mask & (mask - 1):
+                entry = array('d', repeat(inf, m))
+                bits = mask
+                while bits:
+                    low = bits & -bits
+                    bits ^= low
+                    j = low.bit_length() - 1
+                    entry[j] = min(map(add, cost[mask ^ low], rows[j]))
+                cost[mask] = entry
+                self.subsets += 1
+            mask += 1
+        self.next_mask = mask
+
+    def tour(self):
+        # Walks back from the cheapest closing city, re-deriving each predecessor instead of storing them.
+        m, cost, rows, grid = self.m, self.cost, self.rows, self.distance_grid
+        if len(grid) < 4:
+            return list(range(len(grid)))
+        mask = (1 << m) - 1
+        last = min(range(m), key=lambda j: cost[mask][j] + grid[j + 1][0])
+        route = [last + 1]
+        while mask & (mask - 1):
+            mask ^= 1 << last
+            previous = cost[mask]
+            last = min(range(m), key=lambda k: previous[k] + rows[last][k])
+            route.append(last + 1)
+        route.append(0)
+        route.reverse()
+        return route
+
+def spanning_tree_cost(weights, cities):
+    # Prim on the dense weight matrix, restricted to `cities`.
+    inf = math.inf
+    key = {city: inf for city in cities[1:]}
+    city = cities[0]
+    total = 0.0
+    while key:
+        row = weights[city]
+        for other in key:
+            if row[other] < key[other]:
+                key[other] = row[other]
+        city = min(key, key=key.__getitem__)
+        total += key.pop(city)
+    return total
+
+class ExactSolver(RouteOptimizer):
+    # Provably optimal tours for small instances: Held-Karp DP up to exact_dp_limit cities, otherwise
+    # depth-first branch and bound from city 0 under the Held-Karp penalties (which shift every tour by the
+    # same amount), pruning a partial path once its cost plus a bound on the rest reaches the best tour.
+    # The DP, the penalty optimisation and the search are all resumable so they can be time-sliced; the
+    # latter two give up with the best tour found after exact_time_limit seconds. Refuses instances above
+    # exact_size_limit cities.
+    def __init__(self, nodes, distance_grid=None):
+        count = len(distance_grid) if distance_grid is not None else len(nodes)
+        if count > exact_size_limit:
+            raise ValueError(f'the exact solver handles at most {exact_size_limit} cities, not {count}')
+        super().__init__(nodes, distance_grid, initial_tour='greedy')
+        self.search_nodes = 0
+        self.search_time = 0.0
+        self.proven = self.node_count < 4
+        self.bound = HeldKarpBound(self.distance_grid)
+        self.stack = None
+        self.program = None
+        if self.proven:
+            self.bound.bound = self.shortest_distance
+        elif self.node_count > exact_dp_limit:
+            self.polish()
+        else:
+            self.program = HeldKarpProgram(self.distance_grid)
+
+    def start_search(self):
+        # Called once the penalties have converged.
+        n = self.node_count
+        self.check_bound()
+        penalties = self.bound.penalties
+        grid = self.distance_grid
+        self.weights = [[grid[i][j] + penalties[i] + penalties[j] for j in range(n)] for i in range(n)]
+        self.offset = 2 * sum(penalties)
+        self.path = [0]
+        self.path_costs = [0.0]
+        self.unvisited = set(range(1, n))
+        self.stack = [self.children(0)]
+
+    @property
+    def finished(self):
+        return self.proven or self.search_time >= exact_time_limit
+
+    def check_bound(self):
+        if self.bound.bound >= self.shortest_distance * (1 - 1e-9):
+            self.proven = True
+
+    def children(self, city):
+        return iter(sorted(self.unvisited, key=self.weights[city].__getitem__))
+
+    def solve_dp(self, time_budget):
+        program = self.program
+        filled = program.subsets
+        program.run_for(time_budget)
+        # Each DP subset counts as one search node.
+        self.search_nodes += program.subsets - filled
+        if program.finished:
+            self.optimal_route = program.tour()
+            self.shortest_distance = self.compute_route_length(self.optimal_route)
+            self.program = None
+            self.proven = True
+
+    def search(self, deadline):
+        path, costs, unvisited, stack, weights = self.path, self.path_costs, self.unvisited, self.stack, self.weights
+        best = self.shortest_distance + self.offset - 1e-9
+        while stack:
+            self.search_nodes += 1
+            if not self.search_nodes % 64 and time.perf_counter() >= deadline:
+                return
+            city = next(stack[-1], None)
+            if city is None:
+                stack.pop()
+                if len(path) > 1:
+                    unvisited.add(path.pop())
+                    costs.pop()
+                continue
+            cost = costs[-1] + weights[path[-1]][city]
+            if len(unvisited) == 1:
+                total = cost + weights[city][0]
+                if total < best:
+                    best = total
+                    self.optimal_route = path + [city]
+                    self.shortest_distance = self.compute_route_length(self.optimal_route)
+                continue
+            unvisited.discard(city)
+            # The rest of the tour is an edge into the unvisited cities, a path through them and an edge
+            # back to 0, so it costs at least those two cheapest edges plus their spanning tree.
+            leave, close = weights[city], weights[0]
+            if (cost + min(leave[other] for other in unvisited) + min(close[other] for other in unvisited)
+                    + spanning_tree_cost(weights, list(unvisited)) < best):
+                path.append(city)
+                costs.append(cost)
+                stack.append(self.children(city))
+            else:
+                unvisited.add(city)
+        self.proven = True
+
+    def run_for(self, time_budget):
+        started = time.perf_counter()
+        deadline = started + time_budget
+        if self.node_count <= exact_dp_limit:
+            if not self.proven:
+                self.solve_dp(time_budget)
+        elif not self.finished:
+            if not self.bound.finished:
+                self.bound.run_for(time_budget, self.shortest_distance)
+            if self.bound.finished and self.stack is None:
+                self.start_search()
+            if self.stack is not None and not self.proven:
+                self.search(deadline)
+        self.search_time += time.perf_counter() - started
+        self.current_route = self.optimal_route[:]
+        self.current_length = self.shortest_distance
+        if self.proven:
+            self.bound.bound = self.shortest_distance
+
 class TravelingSalesmanGUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -109,8 +1278,15 @@ class TravelingSalesmanGUI(tk.Tk):
         self.canvas.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
 
         self.node_collection = []
+        self.problem = None  # TSPLIB problem the nodes were loaded from, whose distances the solvers use
+        self.distance_grid = None
+        self.route_line = None
+        self.drawn_route = None
         self.optimizer = None
+        self.lower_bound = None
         self.active = False
+        self.iterations = 0
+        self.solver_time = 0.0
 
         self.create_top_buttons()
 
@@ -129,7 +1305,14 @@ class TravelingSalesmanGUI(tk.Tk):
 
         tk.Button(self.top_bar, text="Generate Nodes", command=self.populate, **button_style).pack(side=tk.LEFT, padx=5)
         tk.Button(self.top_bar, text="Begin Optimization", command=self.initiate_optimizer, **button_style).pack(side=tk.LEFT, padx=5)
+        self.solver_choice = tk.StringVar(self, value=solver_names[0])
+        tk.OptionMenu(self.top_bar, self.solver_choice, *solver_names).pack(side=tk.LEFT, padx=5)
+        self.start_choice = tk.StringVar(self, value="Nearest Neighbour")
+        tk.OptionMenu(self.top_bar, self.start_choice, *construction_methods).pack(side=tk.LEFT, padx=5)
         tk.Button(self.top_bar, text="Clear", command=self.clear, **button_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.top_bar, text="Save Instance", command=self.save_instance, **button_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.top_bar, text="Load Instance", command=self.load_instance, **button_style).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.top_bar, text="Save Solution", command=self.save_solution, **button_style).pack(side=tk.LEFT, padx=5)
 
         self.info_bar = tk.Label(self.top_bar, text="Optimal Route Length: ", anchor="e", fg="#FFFFFF", font=("Helvetica", 10, "bold"))
         self.info_bar.pack(side=tk.RIGHT, padx=10)
@@ -137,6 +1320,7 @@ class TravelingSalesmanGUI(tk.Tk):
     def populate(self):
         self.reset_canvas()
         self.node_collection.clear()
+        self.problem = self.distance_grid = None
         for i in range(city_count):
             self.create_node(i)
         self.display_nodes()
@@ -147,52 +1331,315 @@ class TravelingSalesmanGUI(tk.Tk):
         node = Node(x, y, id)
         self.node_collection.append(node)
 
+    def save_instance(self):
+        if not self.node_collection:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npci', filetypes=[('Instance files', '*.npci'),
+                                                                                  ('TSPLIB problems', '*.tsp')])
+        if path.endswith('.tsp'):
+            problem = self.problem or TsplibFile.Problem('random', [(node.x, node.y) for node in self.node_collection])
+            TsplibFile.save_problem(path, problem)
+        elif path:
+            coordinates = [value for node in self.node_collection for value in (node.x, node.y)]
+            InstanceFile.save_instance(path, InstanceFile.TSP, coordinates=coordinates)
+
+    def load_instance(self):
+        path = filedialog.askopenfilename(filetypes=[('Instance files', '*.npci'), ('TSPLIB problems', '*.tsp')])
+        if not path:
+            return
+        try:
+            if path.endswith('.tsp'):
+                self.load_problem(TsplibFile.load_problem(path))
+                return
+            instance = InstanceFile.load_instance(path)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Load Instance", f"Could not load {path}: {error}")
+            return
+        if instance.kind != InstanceFile.TSP:
+            messagebox.showerror("Load Instance", f"{path} is not a TSP instance")
+            return
+        self.clear()
+        self.node_collection = [Node(x, y, i) for i, (x, y) in enumerate(instance.points)]
+        self.display_nodes()
+
+    def load_problem(self, problem):
+        # Fits the problem's coordinates (longitude east, latitude north for GEO) into the canvas, y up;
+        # the solvers still measure distances with the problem's own metric.
+        points = [(y, x) for x, y in problem.points] if problem.edge_weight_type == 'GEO' else problem.points
+        low_x, low_y = min(x for x, _ in points), min(y for _, y in points)
+        span_x, span_y = max(x for x, _ in points) - low_x or 1, max(y for _, y in points) - low_y or 1
+        height = self.winfo_height()
+        scale = min((self.winfo_width() - 2 * margin) / span_x, (height - 2 * margin) / span_y)
+        self.clear()
+        self.node_collection = [Node(margin + (x - low_x) * scale, height - margin - (y - low_y) * scale, i)
+                                for i, (x, y) in enumerate(points)]
+        self.problem = problem
+        self.distance_grid = problem_distance_grid(problem)
+        self.display_nodes()
+
+    def save_solution(self):
+        if self.optimizer is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npcs', filetypes=[('Solution files', '*.npcs'),
+                                                                                  ('TSPLIB tours', '*.tour')])
+        if path.endswith('.tour'):
+            name = self.problem.name if self.problem is not None else 'random'
+            TsplibFile.save_tour(path, f'{name}.tour', self.optimizer.optimal_route, self.optimizer.shortest_distance)
+        elif path:
+            InstanceFile.save_solution(path, InstanceFile.TSP, self.optimizer.optimal_route,
+                                       self.optimizer.shortest_distance)
+
     def display_nodes(self):
         for node in self.node_collection:
             node.render(self.canvas)
 
     def reset_canvas(self):
         self.canvas.delete("all")
+        self.route_line = None
+        self.drawn_route = None
 
     def initiate_optimizer(self):
         if not self.node_collection:
             self.populate()
-        self.optimizer = RouteOptimizer(self.node_collection)
+        if self.active:
+            return
         self.active = True
-        self.run_optimization()
-
-    def run_optimization(self):
-        if self.active and self.optimizer.heat > 1:
-            self.optimizer.optimize()
-            self.reset_canvas()
-            self.visualize_route(self.optimizer.current_route)
-            self.canvas.update()
-            self.after(10, self.run_optimization)
-        else:
+        self.retire_optimizer()
+        if self.solver_choice.get() == "Exact" or len(self.node_collection) <= exact_auto_limit:
+            if len(self.node_collection) > exact_size_limit:
+                self.active = False
+                messagebox.showinfo("Exact", f"The exact solver handles at most {exact_size_limit} cities")
+                return
+            self.optimizer = ExactSolver(self.node_collection, self.distance_grid)
+            self.lower_bound = self.optimizer.bound
+            self.run_exact(self.optimizer)
+            return
+        if self.solver_choice.get() == "Multi-start SA":
+            self.optimizer = MultiStartAnnealer(self.node_collection, distance_grid=self.distance_grid)
+            self.start_bound()
+            self.optimizer.start()
+            self.run_multistart(self.optimizer)
+            return
+        if self.solver_choice.get() == "Ant Colony":
+            self.optimizer = AntColonyOptimizer(self.node_collection, distance_grid=self.distance_grid)
+            self.start_bound()
+            self.run_colony(self.optimizer)
+            return
+        self.optimizer = RouteOptimizer(self.node_collection, self.distance_grid,
+                                        initial_tour=construction_methods[self.start_choice.get()])
+        self.start_bound()
+        self.iterations = 0
+        self.solver_time = 0.0
+        self.run_optimization(self.optimizer)
+
+    def retire_optimizer(self):
+        # Stops what the previous run left running. Its frames may still be queued; they see that it is no
+        # longer self.optimizer and return without touching the new run.
+        if self.lower_bound is not None:
+            self.lower_bound.stop()
+        if isinstance(self.optimizer, MultiStartAnnealer):
+            self.optimizer.close()
+
+    def start_bound(self):
+        self.lower_bound = HeldKarpBound(self.optimizer.distance_grid)
+        self.lower_bound.start(self.optimizer.shortest_distance)
+
+    def gap_closed(self):
+        # Hands the best length to the lower bound's thread; True once the gap is within gap_threshold.
+        length = self.optimizer.shortest_distance
+        self.lower_bound.upper_bound = length
+        gap = self.lower_bound.gap(length)
+        return gap is not None and gap <= gap_threshold
+
+    def report(self, detail=None):
+        length = self.optimizer.shortest_distance
+        text = f"Optimal Route Length: {int(length)}"
+        gap = self.lower_bound.gap(length)
+        if gap is not None:
+            text += f" (gap {gap:.2f}%)"
+        if detail:
+            text += f" | {detail}"
+        self.info_bar.config(text=text)
+
+    def run_optimization(self, optimizer):
+        if optimizer is not self.optimizer:
+            return
+        if self.active and optimizer.heat > 1:
+            # Each frame runs as many iterations as fit in frame_budget, then redraws once.
+            started = time.perf_counter()
+            self.iterations += optimizer.anneal(frame_budget)
+            self.solver_time += time.perf_counter() - started
+            rate = self.iterations / self.solver_time if self.solver_time else 0
+            if self.gap_closed():
+                self.active = False
+            self.report(f"{rate:,.0f} it/s")
+            self.visualize_route(optimizer.optimal_route)
+            self.after(1, self.run_optimization, optimizer)
+        elif self.node_collection:
+            self.active = False
+            self.show_optimal_length()
+
+    def run_multistart(self, optimizer):
+        if optimizer is not self.optimizer:
+            return
+        if self.active and not optimizer.done:
+            if optimizer.poll():
+                self.visualize_route(optimizer.optimal_route)
+            if self.gap_closed():
+                self.active = False
+            self.report(f"{optimizer.chains} chains")
+            self.after(int(chain_report_interval * 1000), self.run_multistart, optimizer)
+            return
+        optimizer.close()
+        self.active = False
+        if self.node_collection:
+            self.show_optimal_length()
+
+    def run_colony(self, optimizer):
+        if optimizer is not self.optimizer:
+            return
+        if self.active and not optimizer.finished:
+            optimizer.run_for(frame_budget)
+            if self.gap_closed():
+                self.active = False
+            self.report(f"iteration {optimizer.iteration}")
+            self.visualize_route(optimizer.optimal_route)
+            self.after(1, self.run_colony, optimizer)
+        elif self.node_collection:
+            self.active = False
+            self.show_optimal_length()
+
+    def run_exact(self, optimizer):
+        if optimizer is not self.optimizer:
+            return
+        if self.active and not optimizer.finished:
+            optimizer.run_for(frame_budget)
+            self.report(f"{optimizer.search_nodes:,} search nodes")
+            self.visualize_route(optimizer.optimal_route)
+            self.after(1, self.run_exact, optimizer)
+        elif self.node_collection:
             self.active = False
             self.show_optimal_length()
 
     def show_optimal_length(self):
-        self.info_bar.config(text=f"Optimal Route Length: {int(self.optimizer.shortest_distance)}")
-        self.reset_canvas()
+        self.lower_bound.stop()
+        self.optimizer.polish()
+        self.report()
         self.visualize_route(self.optimizer.optimal_route, final=True)
 
     def clear(self):
         self.reset_canvas()
         self.node_collection.clear()
+        self.problem = self.distance_grid = None
         self.info_bar.config(text="Optimal Route Length: ")
         self.active = False
+        self.retire_optimizer()
+        self.optimizer = None
 
     def visualize_route(self, route, final=False):
+        # The tour is one persistent polyline under the node ovals; only its coordinates and colour change.
+        if not route or (route == self.drawn_route and not final):
+            return
         color = 'green' if final else 'red'
-        for i in range(len(route)):
-            node_a = self.node_collection[route[i]]
-            node_b = self.node_collection[ route[(i + 1) % len(route)]]
-            edge = Edge(node_a, node_b)
-            edge.render(self.canvas, hue=color, dotted=True)
-        for node in self.node_collection:
-            node.render(self.canvas, hue='white')
+        nodes = self.node_collection
+        coords = [value for city in route for value in (nodes[city].x, nodes[city].y)]
+        coords += coords[:2]
+        if self.route_line is None:
+            self.route_line = self.canvas.create_line(*coords, fill=color, width=connection_thickness,
+                                                      dash=(4, 2), tags=('route',))
+            self.canvas.tag_lower('route')
+        else:
+            self.canvas.coords(self.route_line, coords)
+            self.canvas.itemconfig(self.route_line, fill=color)
+        if self.drawn_route is None or len(self.drawn_route) != len(route):
+            self.canvas.dtag('node', 'in_tour')
+            for city in route:
+                self.canvas.addtag_withtag('in_tour', nodes[city].oval_id)
+            self.canvas.itemconfig('node', fill=idle_node_hue, outline=idle_node_hue)
+            self.canvas.itemconfig('in_tour', fill='white', outline='white')
+        self.drawn_route = list(route)
+
+def benchmark_solver(name, distance_grid, time_budget):
+    # Runs one solver on the grid for up to time_budget seconds; returns the optimizer and its work count
+    # (annealing iterations, summed over chains for multistart; colony iterations; search nodes or DP
+    # subsets; or improving moves for local search).
+    deadline = time.perf_counter() + time_budget
+    if name == 'annealing':
+        optimizer = RouteOptimizer(None, distance_grid)
+        iterations = 0
+        while optimizer.heat > 1 and time.perf_counter() < deadline:
+            iterations += optimizer.anneal(max(deadline - time.perf_counter(), 0))
+        optimizer.polish()
+    elif name == 'local_search':
+        optimizer = RouteOptimizer(None, distance_grid, initial_tour='greedy')
+        optimizer.polish(time_budget)
+        iterations = optimizer.polish_moves
+    elif name == 'multistart':
+        optimizer = MultiStartAnnealer(None, distance_grid=distance_grid)
+        optimizer.run(time_budget)
+        iterations = optimizer.iterations
+    elif name == 'colony':
+        optimizer = AntColonyOptimizer(None, distance_grid=distance_grid)
+        while not optimizer.finished and time.perf_counter() < deadline:
+            optimizer.run_for(deadline - time.perf_counter())
+        optimizer.polish()
+        iterations = optimizer.iteration
+    elif name == 'exact':
+        optimizer = ExactSolver(None, distance_grid)
+        while not optimizer.finished and time.perf_counter() < deadline:
+            optimizer.run_for(deadline - time.perf_counter())
+        iterations = optimizer.search_nodes
+    else:
+        raise ValueError(f'unknown solver {name}')
+    return optimizer, iterations
+
+def run_benchmark(paths=None, solvers=benchmark_solvers, time_budget=benchmark_time_budget, report_path=None, seed=None):
+    # Runs every solver on every TSPLIB problem (the bundled ones by default) and records length, time,
+    # work done and the gap to the published optimum, or to the length of a matching .opt.tour file.
+    if not paths:
+        paths = sorted(os.path.join(tsplib_directory, name) for name in os.listdir(tsplib_directory)
+                       if name.endswith('.tsp'))
+    results = []
+    for path in paths:
+        problem = TsplibFile.load_problem(path)
+        grid = problem_distance_grid(problem)
+        optimum = problem.optimum
+        tour_path = path[:-len('.tsp')] + '.opt.tour'
+        if optimum is None and os.path.exists(tour_path):
+            route = TsplibFile.load_tour(tour_path)
+            optimum = sum(grid[route[i - 1]][route[i]] for i in range(len(route)))
+        for name in solvers:
+            if name == 'exact' and len(grid) > exact_size_limit:
+                print(f'{problem.name:<12} {name:<12} skipped: more than {exact_size_limit} cities')
+                continue
+            random.seed(seed)
+            started = time.perf_counter()
+            optimizer, iterations = benchmark_solver(name, grid, time_budget)
+            elapsed = time.perf_counter() - started
+            length = optimizer.shortest_distance
+            gap = 100 * (length - optimum) / optimum if optimum else None
+            results.append({'instance': problem.name, 'dimension': len(grid), 'solver': name, 'length': length,
+                            'optimum': optimum, 'gap_percent': gap, 'seconds': elapsed, 'iterations': iterations})
+            gap_text = f'{gap:.2f}%' if gap is not None else 'n/a'
+            print(f'{problem.name:<12} {name:<12} length {length:<10.0f} gap {gap_text:<7} '
+                  f'{elapsed:7.2f} s {iterations:>10,} iterations')
+    if report_path is not None:
+        with open(report_path, 'w') as file:
+            json.dump({'time_budget': time_budget, 'seed': seed, 'results': results}, file, indent=2)
+    return results
 
 if __name__ == '__main__':
-    gui = TravelingSalesmanGUI()
-    gui.mainloop()
+    parser = argparse.ArgumentParser(description='Traveling salesman solvers')
+    parser.add_argument('--benchmark', nargs='*', metavar='TSP_FILE',
+                        help='run the solvers headless on these TSPLIB files (default: the bundled ones)')
+    parser.add_argument('--solvers', nargs='+', choices=benchmark_solvers, default=list(benchmark_solvers))
+    parser.add_argument('--time-budget', type=float, default=benchmark_time_budget,
+                        help='seconds per solver and instance')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--report', default='benchmark.json', help='write the JSON report to this file')
+    args = parser.parse_args()
+    if args.benchmark is not None:
+        run_benchmark(args.benchmark, args.solvers, args.time_budget, args.report, args.seed)
+    else:
+        gui = TravelingSalesmanGUI()
+        gui.mainloop()
@@ -0,0 +1,146 @@
+import math
+from array import array
+
+# TSPLIB problem (.tsp) and tour (.tour) files for symmetric TSP instances with node coordinates.
+# Distances follow the TSPLIB definitions, which round to integers: EUC_2D, ATT and GEO are supported.
+
+EDGE_WEIGHT_TYPES = ('EUC_2D', 'ATT', 'GEO')
+
+# Published optimal tour lengths of the bundled instances
+known_optima = {
+    'burma14': 3323,
+    'ulysses16': 6859,
+    'berlin52': 7542,
+}
+
+
+class Problem:
+    def __init__(self, name, points, edge_weight_type='EUC_2D', comment=''):
+        self.name = name
+        self.points = points
+        self.edge_weight_type = edge_weight_type
+        self.comment = comment
+
+    @property
+    def optimum(self):
+        return known_optima.get(self.name)
+
+    def distance_function(self):
+        return {'EUC_2D': euclidean_distance, 'ATT': pseudo_euclidean_distance, 'GEO': geographical_distance}[
+            self.edge_weight_type]
+
+    def distance_grid(self, typecode='d'):
+        distance = self.distance_function()
+        points = self.points
+        return [array(typecode, [distance(point, other) for other in points]) for point in points]
+
+
+def nint(value):
+    return int(value + 0.5)
+
+
+def euclidean_distance(a, b):
+    return nint(math.dist(a, b))
+
+
+def pseudo_euclidean_distance(a, b):
+    distance = math.sqrt(((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) / 10.0)
+    rounded = nint(distance)
+    return rounded + 1 if rounded < distance else rounded
+
+
+def geographical_radians(value):
+    # TSPLIB GEO coordinates are DDD.MM, degrees and minutes.
+    degrees = int(value)
+    return 3.141592 * (degrees + 5.0 * (value - degrees) / 3.0) / 180.0
+
+
+def geographical_distance(a, b):
+    latitude_a, longitude_a = geographical_radians(a[0]), geographical_radians(a[1])
+    latitude_b, longitude_b = geographical_radians(b[0]), geographical_radians(b[1])
+    q1 = math.cos(longitude_a - longitude_b)
+    q2 = math.cos(latitude_a - latitude_b)
+    q3 = math.cos(latitude_a + latitude_b)
+    return int(6378.388 * math.acos(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3)) + 1.0)
+
+
+def read_sections(path):
+    # Splits a TSPLIB file into its `KEY : value` specification and the lines of each data section.
+    specification = {}
+    sections = {}
+    current = None
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line == 'EOF':
+                continue
+            key, colon, value = line.partition(':')
+            key = key.strip().upper()
+            if key.endswith('_SECTION'):
+                current = sections.setdefault(key, [])
+            elif colon and key[:1].isalpha():
+                specification[key] = value.strip()
+                current = None
+            elif current is not None:
+                current.append(line)
+            else:
+                raise ValueError(f'unexpected line in {path}: {line}')
+    return specification, sections
+
+
+def load_problem(path):
+    specification, sections = read_sections(path)
+    if specification.get('TYPE', 'TSP') != 'TSP':
+        raise ValueError(f'{path} is not a symmetric TSP problem')
+    edge_weight_type = specification.get('EDGE_WEIGHT_TYPE')
+    if edge_weight_type not in EDGE_WEIGHT_TYPES:
+        raise ValueError(f'unsupported EDGE_WEIGHT_TYPE {edge_weight_type} in {path}')
+    try:
+        dimension = int(specification['DIMENSION'])
+        rows = [line.split() for line in sections['NODE_COORD_SECTION']]
+        points = {int(row[0]): (float(row[1]), float(row[2])) for row in rows}
+    except (KeyError, ValueError, IndexError) as error:
+        raise ValueError(f'malformed problem file {path}: {error!r}') from error
+    if sorted(points) != list(range(1, dimension + 1)):
+        raise ValueError(f'{path} does not list nodes 1..{dimension}')
+    return Problem(specification.get('NAME', ''), [points[i] for i in range(1, dimension + 1)],
+                   edge_weight_type, specification.get('COMMENT', ''))
+
+
+def save_problem(path, problem):
+    with open(path, 'w') as file:
+        file.write(f'NAME : {problem.name}\n')
+        if problem.comment:
+            file.write(f'COMMENT : {problem.comment}\n')
+        file.write(f'TYPE : TSP\nDIMENSION : {len(problem.points)}\n')
+        file.write(f'EDGE_WEIGHT_TYPE : {problem.edge_weight_type}\nNODE_COORD_SECTION\n')
+        for i, (x, y) in enumerate(problem.points, 1):
+            file.write(f'{i} {x:.15g} {y:.15g}\n')
+        file.write('EOF\n')
+
+
+def load_tour(path):
+    # Returns the tour as 0-based city indices.
+    specification, sections = read_sections(path)
+    if specification.get('TYPE', 'TOUR') != 'TOUR':
+        raise ValueError(f'{path} is not a tour file')
+    try:
+        ids = [int(value) for line in sections['TOUR_SECTION'] for value in line.split()]
+    except (KeyError, ValueError) as error:
+        raise ValueError(f'malformed tour file {path}: {error!r}') from error
+    if -1 in ids:
+        ids = ids[:ids.index(-1)]
+    if 'DIMENSION' in specification and len(ids) != int(specification['DIMENSION']):
+        raise ValueError(f'{path} lists {len(ids)} cities, expected {specification["DIMENSION"]}')
+    return [i - 1 for i in ids]
+
+
+def save_tour(path, name, route, length=None):
+    with open(path, 'w') as file:
+        file.write(f'NAME : {name}\n')
+        if length is not None:
+            file.write(f'COMMENT : Length {length:.15g}\n')
+        file.write(f'TYPE : TOUR\nDIMENSION : {len(route)}\nTOUR_SECTION\n')
+        for city in route:
+            file.write(f'{city + 1}\n')
+        file.write('-1\nEOF\n')
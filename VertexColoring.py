@@ -1,9 +1,12 @@
 import math
 import random
 import tkinter as tk
-from tkinter import Canvas, Label, Button, Entry
+from tkinter import Canvas, Label, Button, Entry, filedialog
 import threading
 
+import InstanceFile
+from FitnessCache import FitnessCache
+
 # Configuration constants
 EDGE_PROBABILITY = 0.2
 NODE_RADIUS = 10
@@ -13,6 +16,7 @@ GENOME_COUNT = 50
 TOP_PERFORMERS = 2
 MUTATION_RATE = 0.1
 VISUALIZATION_INTERVAL = 0.1
+FITNESS_CACHE_SIZE = 4096
 
 color_palette = [
     '#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF', '#00FFFF', '#FFA500',
@@ -32,6 +36,7 @@ class VertexColoringGUI(tk.Tk):
         self.canvas = Canvas(self, bg="#1A1A1D", highlightthickness=0)
         self.canvas.place(x=0, y=50, width=self.width, height=self.height - 50)
         self.graph = None
+        self.best_coloring = None
         self.best_fitness = float('inf')
         self.current_conflicts = 0
         self.initialize_control_panel()
@@ -55,6 +60,12 @@ class VertexColoringGUI(tk.Tk):
                font=("Arial", 12)).place(x=420, y=10)
         Button(control_panel, text="Run Algorithm", command=self.start_optimization, bg="#555555", fg="black",
                font=("Arial", 12)).place(x=550, y=10)
+        Button(control_panel, text="Save Instance", command=self.save_instance, bg="#555555", fg="black",
+               font=("Arial", 12)).place(x=670, y=10)
+        Button(control_panel, text="Load Instance", command=self.load_instance, bg="#555555", fg="black",
+               font=("Arial", 12)).place(x=790, y=10)
+        Button(control_panel, text="Save Solution", command=self.save_solution, bg="#555555", fg="black",
+               font=("Arial", 12)).place(x=910, y=10)
 
         self.status_label = Label(control_panel, text="", fg="white", bg="#333333", font=("Arial", 12), anchor="e")
         self.status_label.place(x=self.width - 450, y=10, width=450)
@@ -68,9 +79,44 @@ class VertexColoringGUI(tk.Tk):
             return
 
         self.graph = GraphTopology(node_count, EDGE_PROBABILITY)
+        self.best_coloring = None
         self.clear_canvas()
         self.draw_vertex()
 
+    def save_instance(self):
+        if not self.graph:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npci', filetypes=[('Instance files', '*.npci')])
+        if path:
+            coordinates = [value for node in range(self.graph.node_count) for value in self.graph.get_node_position(node)]
+            edges = [node for edge in self.graph.get_edges() for node in edge]
+            InstanceFile.save_instance(path, InstanceFile.COLORING, coordinates=coordinates, edges=edges)
+
+    def load_instance(self):
+        path = filedialog.askopenfilename(filetypes=[('Instance files', '*.npci')])
+        if not path:
+            return
+        try:
+            self.color_count = int(self.color_entry.get())
+            instance = InstanceFile.load_instance(path)
+        except (OSError, ValueError) as error:
+            print(f"Could not load {path}: {error}")
+            return
+        if instance.kind != InstanceFile.COLORING:
+            print(f"{path} is not a vertex coloring instance")
+            return
+        self.graph = GraphTopology.from_instance(instance)
+        self.best_coloring = None
+        self.clear_canvas()
+        self.draw_vertex()
+
+    def save_solution(self):
+        if self.best_coloring is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npcs', filetypes=[('Solution files', '*.npcs')])
+        if path:
+            InstanceFile.save_solution(path, InstanceFile.COLORING, self.best_coloring, self.best_fitness)
+
     def clear_canvas(self):
         self.canvas.delete("all")
 
@@ -115,6 +161,8 @@ class VertexColoringGUI(tk.Tk):
         thread.start()
 
     def run_optimization(self):
+        self.fitness_cache = FitnessCache(FITNESS_CACHE_SIZE)
+
         def calculate_conflicts(coloring):
             conflicts = 0
             for edge in self.graph.get_edges():
@@ -124,7 +172,7 @@ class VertexColoringGUI(tk.Tk):
             return conflicts
 
         def evaluate_fitness(genome):
-            return calculate_conflicts(genome)
+            return self.fitness_cache.get(genome, calculate_conflicts)
 
         def create_initial_population():
             return [[random.randint(0, self.color_count - 1) for _ in range(self.graph.node_count)] for _ in
@@ -163,10 +211,11 @@ class VertexColoringGUI(tk.Tk):
             population_fitness.sort(key=lambda x: x[1])
 
             best_genome = population_fitness[0][0]
+            self.best_coloring = best_genome
             self.best_fitness = population_fitness[0][1]
             self.current_conflicts = self.best_fitness
 
-            print(f'Generation {generation}, Current Conflicts: {self.best_fitness}')
+            print(f'Generation {generation}, Current Conflicts: {self.best_fitness}, Fitness cache: {self.fitness_cache.stats()}')
             self.after(0, self.clear_canvas)
             self.after(0, self.draw_vertex, best_genome)
             self.after(0, self.update_status_display, generation)
@@ -241,6 +290,14 @@ class GraphTopology:
             y = radius * math.sin(angle)
             self.node_coordinates[i] = (x, y)
 
+    @classmethod
+    def from_instance(cls, instance):
+        graph = cls.__new__(cls)
+        graph.node_count = len(instance.coordinates) // 2
+        graph.edges = instance.edge_pairs
+        graph.node_coordinates = dict(enumerate(instance.points))
+        return graph
+
     def get_edges(self):
         return self.edges
 